@@ -0,0 +1,284 @@
+"""
+In-process stand-ins for PyGithub and the OpenAI client.
+
+They expose just the surface the service uses, answer after a configurable
+latency, fail at a configurable rate and count every call, so a benchmark
+can run the real review pipeline without network access or credentials.
+"""
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class PRShape:
+    """Size and mix of the synthetic pull requests served by FakeGithub"""
+    files: int = 20
+    patch_lines: int = 40
+    large_files: int = 1
+    large_patch_lines: int = 1500
+    test_files: int = 2
+    hunk_lines: int = 20
+    # Files in the repository tree besides the changed ones and their tests
+    repo_files: int = 500
+
+
+class FakeServiceError(Exception):
+    """Injected failure; `status` mimics a 502 from the upstream API"""
+
+    def __init__(self, service: str):
+        super().__init__(f"Injected {service} failure")
+        self.status = 502
+        self.status_code = 502
+
+
+class _Latency:
+    """Sleeps for a jittered latency and injects failures at a fixed rate"""
+
+    def __init__(self, service: str, latency: float, jitter: float, error_rate: float, seed: Optional[int]):
+        self.service = service
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, extra: float = 0.0):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + extra + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        if failed:
+            raise FakeServiceError(self.service)
+
+
+def _patch(filename: str, lines: int, hunk_lines: int, seed: int) -> str:
+    """Unified diff adding `lines` lines in hunks of `hunk_lines`, with the odd removed line"""
+    rng = random.Random(seed)
+    hunks = []
+    new_line = 1
+    for start in range(0, lines, hunk_lines):
+        count = min(hunk_lines, lines - start)
+        body = [" def existing_function():"]
+        removed = 0
+        for offset in range(count):
+            if rng.random() < 0.1:
+                body.append(f"-    old_value_{offset} = compute({offset})")
+                removed += 1
+            body.append(f"+    value_{start + offset} = compute({rng.randint(0, 1000)})  # {filename}")
+        header = f"@@ -{new_line},{1 + removed} +{new_line},{1 + count} @@ def section_{start}():"
+        hunks.append("\n".join([header] + body))
+        new_line += count + 10
+    return "\n".join(hunks)
+
+
+class FakeGithub:
+    """PyGithub `Github` stand-in serving synthetic pull requests of a given shape"""
+
+    def __init__(self, shape: PRShape = PRShape(), latency: float = 0.05, jitter: float = 0.01,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.shape = shape
+        self.requester = None
+        self._call = _Latency("github", latency, jitter, error_rate, seed)
+        self._files = self._build_files()
+        self._tree = self._build_tree()
+        self._comments: Dict[int, List["_FakeComment"]] = {}
+        self.login = "bench-bot"
+
+    @property
+    def calls(self) -> int:
+        return self._call.calls
+
+    @property
+    def errors(self) -> int:
+        return self._call.errors
+
+    def _build_files(self) -> List[SimpleNamespace]:
+        shape = self.shape
+        files = []
+        for index in range(shape.files):
+            if index < shape.test_files:
+                filename = f"tests/test_module_{index}.py"
+            else:
+                filename = f"src/module_{index}.py"
+            lines = shape.large_patch_lines if shape.test_files <= index < shape.test_files + shape.large_files else shape.patch_lines
+            patch = _patch(filename, lines, shape.hunk_lines, seed=index)
+            additions = sum(1 for line in patch.splitlines() if line.startswith("+"))
+            deletions = sum(1 for line in patch.splitlines() if line.startswith("-"))
+            files.append(SimpleNamespace(
+                filename=filename, status="modified", additions=additions, deletions=deletions,
+                changes=additions + deletions, patch=patch, raw_url=f"https://example.invalid/raw/{filename}"
+            ))
+        return files
+
+    def _build_tree(self) -> List[str]:
+        """Repository paths: the changed files, a test for every other changed module, and filler"""
+        paths = [file.filename for file in self._files]
+        paths += [f"tests/test_module_{index}.py" for index in range(self.shape.test_files, self.shape.files, 2)]
+        paths += [f"pkg/part_{index // 50}/file_{index}.py" for index in range(self.shape.repo_files)]
+        return sorted(set(paths))
+
+    def get_user(self) -> SimpleNamespace:
+        self._call()
+        return SimpleNamespace(login=self.login)
+
+    def get_repo(self, repo_name: str) -> "_FakeRepo":
+        self._call()
+        return _FakeRepo(self, repo_name)
+
+
+class _FakeRepo:
+    def __init__(self, github: FakeGithub, full_name: str):
+        self._github = github
+        self.full_name = full_name
+
+    def get_pull(self, number: int) -> "_FakePull":
+        self._github._call()
+        return _FakePull(self._github, number)
+
+    def get_pulls(self, **kwargs) -> List["_FakePull"]:
+        self._github._call()
+        return [_FakePull(self._github, number) for number in range(1, 11)]
+
+    def get_git_tree(self, sha: str, recursive: bool = False) -> SimpleNamespace:
+        self._github._call()
+        return SimpleNamespace(
+            sha=sha,
+            tree=[SimpleNamespace(path=path, type="blob") for path in self._github._tree],
+            raw_data={"truncated": False},
+        )
+
+    def compare(self, base: str, head: str) -> SimpleNamespace:
+        self._github._call()
+        return SimpleNamespace(status="identical" if base == head else "ahead", files=[])
+
+
+class _FakePull:
+    def __init__(self, github: FakeGithub, number: int):
+        self._github = github
+        now = datetime.now(timezone.utc)
+        files = github._files
+        self.number = number
+        self.title = f"Synthetic PR #{number}"
+        self.body = "Generated by the benchmark harness"
+        self.user = SimpleNamespace(login="bench-user")
+        self.base = SimpleNamespace(ref="main", sha="0" * 40)
+        self.head = SimpleNamespace(ref=f"feature-{number}", sha=f"{number:040x}")
+        self.state = "open"
+        self.mergeable = True
+        self.changed_files = len(files)
+        self.additions = sum(file.additions for file in files)
+        self.deletions = sum(file.deletions for file in files)
+        self.created_at = now - timedelta(hours=1)
+        self.updated_at = now
+
+    def get_files(self) -> List[SimpleNamespace]:
+        self._github._call()
+        return list(self._github._files)
+
+    def get_issue_comments(self) -> List["_FakeComment"]:
+        self._github._call()
+        return list(self._github._comments.get(self.number, []))
+
+    def create_issue_comment(self, body: str) -> "_FakeComment":
+        self._github._call()
+        comment = _FakeComment(self._github, self.number, body)
+        self._github._comments.setdefault(self.number, []).append(comment)
+        return comment
+
+
+class _FakeComment:
+    def __init__(self, github: FakeGithub, pr_number: int, body: str):
+        self._github = github
+        self._pr_number = pr_number
+        self.id = random.randint(1, 10 ** 9)
+        self.body = body
+        self.user = SimpleNamespace(login=github.login)
+        self.html_url = f"https://example.invalid/pull/{pr_number}#issuecomment-{self.id}"
+        self.created_at = datetime.now(timezone.utc)
+
+    def edit(self, body: str):
+        self._github._call()
+        self.body = body
+
+    def delete(self):
+        self._github._call()
+        self._github._comments[self._pr_number].remove(self)
+
+
+_FILE_MARKER = re.compile(r"^=== FILE: (.+) ===$", re.MULTILINE)
+
+
+class FakeOpenAI:
+    """OpenAI client stand-in for `chat.completions.with_raw_response.create`
+
+    Latency grows with the requested output size (`seconds_per_token` per
+    max_tokens) on top of a fixed round trip. Batched prompts get one answer
+    per file marker so the service's response splitting is exercised.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.1, error_rate: float = 0.0,
+                 seconds_per_token: float = 0.0, seed: Optional[int] = None):
+        self.seconds_per_token = seconds_per_token
+        self._call = _Latency("openai", latency, jitter, error_rate, seed)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self._create)
+        ))
+
+    @property
+    def calls(self) -> int:
+        return self._call.calls
+
+    @property
+    def errors(self) -> int:
+        return self._call.errors
+
+    def _create(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 1000, **kwargs) -> "_FakeRawResponse":
+        prompt = "\n".join(message["content"] for message in messages)
+        self._call(extra=self.seconds_per_token * max_tokens)
+
+        filenames = _FILE_MARKER.findall(prompt)
+        verdict = "Code quality: 7/10. No blocking issues; consider clearer names and more tests."
+        if filenames:
+            content = "\n".join(f"=== FILE: {filename} ===\n{verdict}" for filename in filenames)
+        else:
+            content = verdict
+
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = min(max_tokens, len(content) // 4 + 1)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        return _FakeRawResponse(model, content, prompt_tokens, completion_tokens)
+
+
+class _FakeRawResponse:
+    headers: Dict[str, str] = {}
+
+    def __init__(self, model: str, content: str, prompt_tokens: int, completion_tokens: int):
+        self._parsed = SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    def parse(self) -> Any:
+        return self._parsed
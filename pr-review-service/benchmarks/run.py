@@ -0,0 +1,267 @@
+"""
+End-to-end review benchmark against local GitHub and OpenAI stand-ins.
+
+Drives `review_pull_request` directly (`--mode agent`) or through the
+FastAPI app's queue and endpoints (`--mode api`, needs `httpx` for the test
+client) and prints a JSON report: p50/p95/p99 latency, throughput, tokens
+and GitHub calls per review. No credentials or network access are needed.
+
+    python -m benchmarks.run --reviews 50 --concurrency 8 --files 30 --output bench.json
+    python -m benchmarks.run --mode api --openai-latency 1.5 --openai-error-rate 0.05
+    python -m benchmarks.run --baseline bench.json --max-regression 0.10
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fakes import FakeGithub, FakeOpenAI, PRShape
+
+
+BENCH_TOKEN = "benchmark-github-token"
+
+# Applied before the service is imported; anything already in the environment wins
+BENCH_ENVIRONMENT = {
+    "TELEMETRY_ENABLED": "false",
+    "AGENTOPS_API_KEY": "benchmark",
+    "OPENAI_API_KEY": "benchmark",
+    "GITHUB_TOKEN": BENCH_TOKEN,
+    # Every review should do its full work rather than hit results of the previous one
+    "ANALYSIS_CACHE_BACKEND": "none",
+    "REVIEW_STATE_PATH": "",
+    "REVIEW_HISTORY_PATH": "",
+    # Measure the service, not the production rate limits
+    "GITHUB_RATE_PER_SECOND": "100000",
+    "GITHUB_RATE_BURST": "100000",
+    "OPENAI_RATE_PER_SECOND": "100000",
+    "OPENAI_RATE_BURST": "100000",
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of `values` (fraction in 0..1)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _review_metrics(result: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    if not result:
+        return {"tokens": 0, "github_requests": 0, "file_errors": 0}
+    analyses = result.get("file_analyses", [])
+    return {
+        "tokens": sum(analysis.get("tokens_used", 0) for analysis in analyses),
+        "github_requests": result.get("github_requests", 0),
+        "file_errors": sum(1 for analysis in analyses if analysis.get("error")),
+    }
+
+
+def run_agent(reviews: int, concurrency: int, post_comment: bool) -> List[Dict[str, Any]]:
+    """Call `review_pull_request` from `concurrency` threads"""
+    from src.main import review_pull_request
+
+    def one(index: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = review_pull_request(f"bench/repo-{index % concurrency}", index + 1, post_comment=post_comment)
+            error = None
+        except Exception as e:
+            result, error = None, str(e)
+        return {"latency": time.perf_counter() - started, "error": error, **_review_metrics(result)}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(reviews)))
+
+
+def run_api(reviews: int, poll_interval: float, post_comment: bool) -> List[Dict[str, Any]]:
+    """Submit every review to `POST /review` and poll `GET /review/{job_id}` until each finishes"""
+    from fastapi.testclient import TestClient
+    from src import api
+
+    samples = []
+    with TestClient(api.app) as client:
+        job_ids = []
+        for index in range(reviews):
+            response = client.post("/review", json={
+                "repo_name": f"bench/repo-{index % api.job_queue.workers}",
+                "pr_number": index + 1,
+                "post_comment": post_comment,
+            })
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+
+        for job_id in job_ids:
+            while True:
+                body = client.get(f"/review/{job_id}").json()
+                if body["status"] not in ("queued", "running"):
+                    break
+                time.sleep(poll_interval)
+            job = api.job_queue.get(job_id)
+            samples.append({
+                # Server-side timestamps: from submission to completion, including queue wait
+                "latency": body["finished_at"] - body["created_at"],
+                "error": body["error"],
+                **_review_metrics(job.result if job is not None else None),
+            })
+    return samples
+
+
+def build_report(args: argparse.Namespace, samples: List[Dict[str, Any]], wall_seconds: float,
+                 github: FakeGithub, llm: FakeOpenAI) -> Dict[str, Any]:
+    latencies = [sample["latency"] for sample in samples if sample["error"] is None]
+    completed = len(latencies)
+
+    def per_review(total: float) -> float:
+        return round(total / completed, 2) if completed else 0.0
+
+    tokens = sum(sample["tokens"] for sample in samples)
+    github_requests = sum(sample["github_requests"] for sample in samples)
+    return {
+        "mode": args.mode,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "reviews": args.reviews,
+            "concurrency": args.concurrency,
+            "post_comment": args.post_comment,
+            "pr_shape": vars(github.shape),
+            "github": {"latency": args.github_latency, "error_rate": args.github_error_rate},
+            "openai": {"latency": args.openai_latency, "error_rate": args.openai_error_rate,
+                       "seconds_per_token": args.openai_seconds_per_token},
+        },
+        "reviews": {
+            "completed": completed,
+            "failed": len(samples) - completed,
+            "files_with_errors": sum(sample["file_errors"] for sample in samples),
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_reviews_per_second": round(completed / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 0.50), 4),
+            "p95": round(percentile(latencies, 0.95), 4),
+            "p99": round(percentile(latencies, 0.99), 4),
+            "mean": round(sum(latencies) / completed, 4) if completed else 0.0,
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "tokens": {
+            "total": tokens,
+            "per_review": per_review(tokens),
+            "prompt": llm.prompt_tokens,
+            "completion": llm.completion_tokens,
+        },
+        "github_calls": {
+            "total": github.calls,
+            "per_review": per_review(github.calls),
+            "reported_per_review": per_review(github_requests),
+            "injected_errors": github.errors,
+        },
+        "openai_calls": {
+            "total": llm.calls,
+            "per_review": per_review(llm.calls),
+            "injected_errors": llm.errors,
+        },
+    }
+
+
+# Lower is better for these report fields; a baseline comparison flags increases
+REGRESSION_METRICS = [
+    ("latency_seconds", "p50"),
+    ("latency_seconds", "p95"),
+    ("latency_seconds", "p99"),
+    ("tokens", "per_review"),
+    ("github_calls", "per_review"),
+    ("openai_calls", "per_review"),
+]
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Metrics that grew by more than `max_regression` (a fraction) over the baseline"""
+    regressions = []
+    for section, key in REGRESSION_METRICS:
+        before = baseline.get(section, {}).get(key)
+        after = report[section][key]
+        if before and after > before * (1 + max_regression):
+            regressions.append(f"{section}.{key}: {before} -> {after} (+{(after / before - 1) * 100:.1f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PR reviews against local GitHub/OpenAI fakes")
+    parser.add_argument("--mode", choices=["agent", "api"], default="agent")
+    parser.add_argument("--reviews", type=int, default=20, help="Reviews to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent reviews (API worker count in api mode)")
+    parser.add_argument("--post-comment", action="store_true", help="Include posting the review comment")
+    parser.add_argument("--files", type=int, default=20, help="Changed files per PR")
+    parser.add_argument("--patch-lines", type=int, default=40, help="Added lines per ordinary file")
+    parser.add_argument("--large-files", type=int, default=1, help="Files per PR with an oversized patch")
+    parser.add_argument("--large-patch-lines", type=int, default=1500, help="Added lines per oversized file")
+    parser.add_argument("--test-files", type=int, default=2, help="Test files per PR")
+    parser.add_argument("--github-latency", type=float, default=0.05, help="Seconds per GitHub call")
+    parser.add_argument("--github-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="Seconds per completion round trip")
+    parser.add_argument("--openai-seconds-per-token", type=float, default=0.0,
+                        help="Extra seconds per requested output token")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--poll-interval", type=float, default=0.01, help="Job polling interval in api mode")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed growth over the baseline before exiting non-zero (fraction)")
+    args = parser.parse_args(argv)
+
+    for name, value in BENCH_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    if args.mode == "api":
+        os.environ["REVIEW_WORKERS"] = str(args.concurrency)
+        os.environ["REVIEW_MAX_PER_REPO"] = str(args.concurrency)
+
+    # Imported only now so the settings above are in place
+    from config.settings import GITHUB_TOKEN
+    from src.tools.analysis_tools import set_openai_client
+    from src.tools.github_client import GitHubClient, register_github_client
+
+    shape = PRShape(files=args.files, patch_lines=args.patch_lines, large_files=args.large_files,
+                    large_patch_lines=args.large_patch_lines, test_files=args.test_files)
+    github = FakeGithub(shape, latency=args.github_latency, jitter=args.github_latency / 5,
+                        error_rate=args.github_error_rate, seed=args.seed)
+    llm = FakeOpenAI(latency=args.openai_latency, jitter=args.openai_latency / 5,
+                     error_rate=args.openai_error_rate, seconds_per_token=args.openai_seconds_per_token,
+                     seed=args.seed)
+    register_github_client(GITHUB_TOKEN, GitHubClient(GITHUB_TOKEN, github=github))
+    set_openai_client(llm)
+
+    started = time.perf_counter()
+    if args.mode == "agent":
+        samples = run_agent(args.reviews, args.concurrency, args.post_comment)
+    else:
+        samples = run_api(args.reviews, args.poll_interval, args.post_comment)
+    report = build_report(args, samples, time.perf_counter() - started, github, llm)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Cold-start benchmark: how long a fresh worker process takes to become ready.
+
+Each scenario runs in a new interpreter so nothing is warm, and reports
+p50/max/mean as JSON. Scenarios: importing `src.main` (library and CLI use),
+importing `src.api`, and importing `src.api` plus running the FastAPI lifespan
+until the app is serving. `--importtime` adds the slowest imports of `src.api`.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --telemetry --max-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import BENCH_ENVIRONMENT, percentile
+
+
+SCENARIOS = {
+    "import_main": "import src.main",
+    "import_api": "import src.api",
+    "api_ready": (
+        "import asyncio\n"
+        "from src import api\n"
+        "async def boot():\n"
+        "    async with api.lifespan(api.app):\n"
+        "        pass\n"
+        "asyncio.run(boot())"
+    ),
+}
+
+_CHILD = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - started)"
+)
+
+
+def _environment(telemetry: bool) -> Dict[str, str]:
+    env = {**BENCH_ENVIRONMENT, **os.environ}
+    env["TELEMETRY_ENABLED"] = "true" if telemetry else "false"
+    return env
+
+
+def time_scenario(code: str, runs: int, env: Dict[str, str]) -> Dict[str, float]:
+    """Seconds from the first statement to ready, in `runs` fresh interpreters"""
+    samples: List[float] = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", _CHILD.format(code=code)],
+            capture_output=True, text=True, env=env
+        )
+        if completed.returncode:
+            raise RuntimeError(f"Startup scenario failed:\n{completed.stderr.strip()}")
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    return {
+        "p50": round(percentile(samples, 0.50), 4),
+        "max": round(max(samples), 4),
+        "mean": round(sum(samples) / len(samples), 4),
+    }
+
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def slowest_imports(env: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+    """Modules imported by `src.api`, slowest cumulative time first, from `python -X importtime`"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.api"],
+        capture_output=True, text=True, env=env, check=True
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append({"module": match.group(4), "cumulative_seconds": int(match.group(2)) / 1e6})
+    modules.sort(key=lambda module: module["cumulative_seconds"], reverse=True)
+    return modules[:limit]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--telemetry", action="store_true", help="Start with AgentOps telemetry enabled")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Also report the N slowest imports of src.api")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="Exit non-zero when api_ready p50 exceeds this")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    env = _environment(args.telemetry)
+    report: Dict[str, Any] = {
+        "telemetry": args.telemetry,
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "seconds": {name: time_scenario(code, args.runs, env) for name, code in SCENARIOS.items()},
+    }
+    if args.importtime:
+        report["slowest_imports"] = slowest_imports(env, args.importtime)
+
+    exit_code = 0
+    if args.max_seconds is not None and report["seconds"]["api_ready"]["p50"] > args.max_seconds:
+        report["regression"] = f"api_ready p50 {report['seconds']['api_ready']['p50']}s > {args.max_seconds}s"
+        exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
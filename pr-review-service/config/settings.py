@@ -7,11 +7,134 @@ AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
-if not AGENTOPS_API_KEY:
-    raise ValueError("AGENTOPS_API_KEY environment variable is required")
+# AgentOps telemetry; when disabled the SDK is never imported and no API key is needed
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
 
-if not GITHUB_TOKEN:
-    raise ValueError("GITHUB_TOKEN environment variable is required")
\ No newline at end of file
+def validate_settings():
+    """Raise if a credential needed to run real reviews is missing
+
+    Called when the service starts rather than at import, so modules can be
+    imported (benchmarks, tooling) without live credentials.
+    """
+    if TELEMETRY_ENABLED and not AGENTOPS_API_KEY:
+        raise ValueError("AGENTOPS_API_KEY environment variable is required (or set TELEMETRY_ENABLED=false)")
+
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
+
+    if not GITHUB_TOKEN:
+        raise ValueError("GITHUB_TOKEN environment variable is required")
+
+
+# Per-file analysis concurrency
+ANALYSIS_MAX_IN_FLIGHT = int(os.getenv("ANALYSIS_MAX_IN_FLIGHT", "8"))
+ANALYSIS_CALL_TIMEOUT = float(os.getenv("ANALYSIS_CALL_TIMEOUT", "120"))
+
+# Background review job queue
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", "4"))
+REVIEW_MAX_PER_REPO = int(os.getenv("REVIEW_MAX_PER_REPO", "2"))
+REVIEW_QUEUE_MAX = int(os.getenv("REVIEW_QUEUE_MAX", "500"))
+REVIEW_JOB_RETENTION = int(os.getenv("REVIEW_JOB_RETENTION", "1000"))
+
+# Multi-worker deployment: "memory" keeps the job queue per process; "sqlite" shares the
+# queue, in-flight dedup and (by default) the analysis cache between processes on one host
+COORDINATION_BACKEND = os.getenv("COORDINATION_BACKEND", "memory").lower()
+COORDINATION_PATH = os.getenv("COORDINATION_PATH", "coordination.sqlite3")
+COORDINATION_POLL_SECONDS = float(os.getenv("COORDINATION_POLL_SECONDS", "0.5"))
+COORDINATION_STALE_SECONDS = float(os.getenv("COORDINATION_STALE_SECONDS", "30"))
+
+# Shared GitHub client
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "10"))
+GITHUB_PER_PAGE = int(os.getenv("GITHUB_PER_PAGE", "100"))
+GITHUB_PULL_CACHE_TTL = float(os.getenv("GITHUB_PULL_CACHE_TTL", "300"))
+
+# Review comments: edit the service's earlier comment in place instead of adding one per review,
+# and split summaries longer than GitHub's comment limit across follow-up comments
+COMMENT_UPSERT = os.getenv("COMMENT_UPSERT", "true").lower() in ("1", "true", "yes")
+COMMENT_MAX_CHARS = int(os.getenv("COMMENT_MAX_CHARS", "65536"))
+
+# Repository file-tree index used to map changed sources to their tests
+TEST_INDEX_ENABLED = os.getenv("TEST_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+TEST_INDEX_CACHE_SIZE = int(os.getenv("TEST_INDEX_CACHE_SIZE", "32"))
+
+# LLM analysis cache: "memory", "sqlite" or "none"
+ANALYSIS_CACHE_BACKEND = os.getenv(
+    "ANALYSIS_CACHE_BACKEND", "sqlite" if COORDINATION_BACKEND == "sqlite" else "memory"
+).lower()
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "analysis_cache.sqlite3")
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Incremental re-review state ("" disables incremental reviews)
+REVIEW_STATE_PATH = os.getenv("REVIEW_STATE_PATH", "review_state.sqlite3")
+
+# History of every finished review, served by the /reviews endpoints ("" disables it)
+REVIEW_HISTORY_PATH = os.getenv("REVIEW_HISTORY_PATH", "review_history.sqlite3")
+REVIEW_HISTORY_MAX_PAGE_SIZE = int(os.getenv("REVIEW_HISTORY_MAX_PAGE_SIZE", "200"))
+
+# Security scanner rules (defaults to the bundled src/tools/security_rules.json)
+SECURITY_RULES_PATH = os.getenv("SECURITY_RULES_PATH", "")
+
+# LLM request sizing and batching of small patches
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "1000"))
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "3000"))
+BATCH_SMALL_PATCH_TOKENS = int(os.getenv("BATCH_SMALL_PATCH_TOKENS", "400"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "10"))
+BATCH_RESPONSE_TOKENS_PER_FILE = int(os.getenv("BATCH_RESPONSE_TOKENS_PER_FILE", "300"))
+
+# Local static analysis of changed Python and JS/TS ("0" workers runs it in the review thread)
+STATIC_ANALYSIS_ENABLED = os.getenv("STATIC_ANALYSIS_ENABLED", "true").lower() in ("1", "true", "yes")
+STATIC_ANALYSIS_WORKERS = int(os.getenv("STATIC_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+STATIC_MAX_COMPLEXITY = int(os.getenv("STATIC_MAX_COMPLEXITY", "10"))
+STATIC_MAX_FUNCTION_LINES = int(os.getenv("STATIC_MAX_FUNCTION_LINES", "60"))
+
+# Tiered model cascade: "model" reviews each file with CASCADE_FAST_MODEL first and "heuristic"
+# with a local risk scorer; risky files escalate to the review model. "off" sends every file to it
+CASCADE_MODE = os.getenv("CASCADE_MODE", "model").lower()
+CASCADE_FAST_MODEL = os.getenv("CASCADE_FAST_MODEL", "gpt-4o-mini")
+CASCADE_MIN_SCORE = float(os.getenv("CASCADE_MIN_SCORE", "7"))
+CASCADE_MAX_COMPLEXITY = int(os.getenv("CASCADE_MAX_COMPLEXITY", "15"))
+# Only high-confidence security findings escalate; adding "medium" catches more (e.g. XSS sinks)
+# at the cost of sending more files to the review model
+CASCADE_ESCALATE_SEVERITIES = {s.strip().lower() for s in os.getenv(
+    "CASCADE_ESCALATE_SEVERITIES", "high"
+).split(",") if s.strip()}
+
+# Oversized patches: chunked map-reduce analysis, and files that skip or only get a summary
+LARGE_PATCH_TOKENS = int(os.getenv("LARGE_PATCH_TOKENS", "3000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "2000"))
+CHUNK_MAX_IN_FLIGHT = int(os.getenv("CHUNK_MAX_IN_FLIGHT", "4"))
+SKIP_PATTERNS = [p.strip() for p in os.getenv("SKIP_PATTERNS", "").split(",") if p.strip()]
+SUMMARIZE_ONLY_PATTERNS = [p.strip() for p in os.getenv(
+    "SUMMARIZE_ONLY_PATTERNS",
+    "package-lock.json,yarn.lock,pnpm-lock.yaml,poetry.lock,Pipfile.lock,Cargo.lock,go.sum,"
+    "*.min.js,*.min.css,*.map,vendor/*,node_modules/*"
+).split(",") if p.strip()]
+
+# Pre-LLM triage
+TRIAGE_BINARY_EXTENSIONS = {e.strip().lower() for e in os.getenv(
+    "TRIAGE_BINARY_EXTENSIONS",
+    ".png,.jpg,.jpeg,.gif,.webp,.avif,.ico,.bmp,.tiff,.pdf,.zip,.gz,.tar,.jar,.woff,.woff2,.ttf,.otf,.eot,"
+    ".mp3,.mp4,.mov,.webm,.wasm,.so,.dll,.exe,.bin,.pyc"
+).split(",") if e.strip()}
+TRIAGE_STATIC_EXTENSIONS = {e.strip().lower() for e in os.getenv(
+    "TRIAGE_STATIC_EXTENSIONS", ".md,.txt,.rst,.csv,.svg"
+).split(",") if e.strip()}
+
+# Shared outbound rate limiting (token buckets; rates in requests per second)
+GITHUB_RATE_PER_SECOND = float(os.getenv("GITHUB_RATE_PER_SECOND", "1.4"))
+GITHUB_RATE_BURST = float(os.getenv("GITHUB_RATE_BURST", "100"))
+OPENAI_RATE_PER_SECOND = float(os.getenv("OPENAI_RATE_PER_SECOND", "3"))
+OPENAI_RATE_BURST = float(os.getenv("OPENAI_RATE_BURST", "20"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+
+# Seconds between keep-alive comments on an idle review event stream
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+# GitHub webhook receiver (the endpoint is disabled until a secret is set)
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+WEBHOOK_DEBOUNCE_SECONDS = float(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "10"))
+WEBHOOK_POST_COMMENT = os.getenv("WEBHOOK_POST_COMMENT", "true").lower() in ("1", "true", "yes")
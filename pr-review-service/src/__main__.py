@@ -0,0 +1,32 @@
+"""
+Serve the REST API:
+
+    python -m src --port 8000
+    COORDINATION_BACKEND=sqlite python -m src --workers 4
+
+Equivalent to `uvicorn src.api:app`. Start the service this way (or with
+uvicorn) rather than by running `src/api.py` as a script: the static
+analysis pool's spawned processes re-import the main module, and only a
+package `__main__` like this one is skipped, so they never import the app
+or set up its job queue.
+"""
+
+import argparse
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the PR review REST API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Server processes (share their queue with COORDINATION_BACKEND=sqlite)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run("src.api:app", host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,24 +1,93 @@
-from typing import Dict, List, Any
-from agentops.sdk.decorators import agent, operation
-from src.tools.github_tools import get_pr_files, get_pr_info, post_pr_comment
-from src.tools.analysis_tools import analyze_code_quality, scan_for_security_issues, analyze_test_coverage
+import logging
+import threading
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from config.settings import STATIC_ANALYSIS_ENABLED, TEST_INDEX_ENABLED
+from src.core.telemetry import agent, operation
+from src.tools.github_tools import get_pr_details, post_pr_comment
+from src.tools.review_comment import fits_in_comment, split_comment
+from src.tools.github_client import get_github_client
+from src.tools.analysis_tools import (
+    analyze_with_cascade, expected_calls, scan_for_security_issues, analyze_test_coverage, ANALYSIS_VERSION
+)
+from src.tools.batching import count_tokens, plan_batches
+from src.tools.chunking import summarize_patch
+from src.tools.triage import SKIP, STATIC, LLM, triage_file
+from src.tools.cascade import summarize_cascade
+from src.tools.security_scanner import is_serious
+from src.tools.test_index import get_test_index
+from src.tools.static_analysis import run_static_analysis
+from src.core.analysis_engine import AnalysisEngine
+from src.core.analysis_cache import patch_hash
+from src.core.review_state import ReviewStateStore, get_review_state_store
+from src.core.review_history import ReviewHistoryStore, get_review_history
+from src.core.job_queue import ReviewCancelled
+from src.core.metrics import time_stage
+
+
+logger = logging.getLogger(__name__)
+
+# Receives (event name, payload) as each part of a review becomes available
+ReviewEventCallback = Callable[[str, Dict[str, Any]], None]
 
 
 @agent(name="PRReviewerAgent")
 class PRReviewerAgent:
     """AI-powered PR reviewer agent that analyzes code changes and provides feedback"""
     
-    def __init__(self, github_token: str, agent_id: str = "pr-reviewer"):
+    def __init__(self, github_token: str, agent_id: str = "pr-reviewer",
+                 engine: Optional[AnalysisEngine] = None,
+                 state_store: Optional[ReviewStateStore] = None,
+                 history: Optional[ReviewHistoryStore] = None):
         self.github_token = github_token
         self.agent_id = agent_id
+        self.engine = engine or AnalysisEngine()
+        self.state_store = state_store or get_review_state_store()
+        self.history = history or get_review_history()
     
     @operation
-    def review_pull_request(self, repo_name: str, pr_number: int, post_comment: bool = True) -> Dict[str, Any]:
-        """Comprehensive PR review including code quality, security, and test coverage analysis"""
+    def review_pull_request(self, repo_name: str, pr_number: int, post_comment: bool = True,
+                            on_event: Optional[ReviewEventCallback] = None,
+                            cancel_event: Optional[threading.Event] = None,
+                            head_sha: Optional[str] = None) -> Dict[str, Any]:
+        """Comprehensive PR review including code quality, security, and test coverage analysis
+        
+        `on_event` receives partial results as they are ready: "pr_info", one
+        "file_analysis" per reviewed file (in completion order), then
+        "security_findings", "test_coverage" and "recommendation".
+        Once `cancel_event` is set the review raises ReviewCancelled at its next
+        checkpoint and never posts a comment. With `head_sha` (the commit a
+        webhook asked about) the comment is skipped if the PR has moved on
+        since; the review of the newer head still runs and is returned.
+        """
+        
+        github_client = get_github_client(self.github_token)
+        try:
+            with time_stage("review"):
+                return self._review(repo_name, pr_number, post_comment, on_event, cancel_event, head_sha)
+        finally:
+            # The cached pull object lives for exactly one review
+            github_client.release_pull(repo_name, pr_number)
+    
+    def _review(self, repo_name: str, pr_number: int, post_comment: bool,
+                on_event: Optional[ReviewEventCallback] = None,
+                cancel_event: Optional[threading.Event] = None,
+                head_sha: Optional[str] = None) -> Dict[str, Any]:
+        """Review body; runs while the PR's GitHub objects are cached"""
+        
+        def emit(event: str, data: Dict[str, Any]):
+            if on_event is not None:
+                on_event(event, data)
+        
+        def checkpoint():
+            if cancel_event is not None and cancel_event.is_set():
+                raise ReviewCancelled(f"Review of {repo_name}#{pr_number} was cancelled")
         
-        # Get PR information and files
-        pr_info = get_pr_info(self.github_token, repo_name, pr_number)
-        files_data = get_pr_files(self.github_token, repo_name, pr_number)
+        # Get PR information and files in one step
+        with time_stage("github_fetch"):
+            pr_details = get_pr_details(self.github_token, repo_name, pr_number)
+        pr_info = pr_details["pr_info"]
+        files_data = pr_details["files"]
+        checkpoint()
         
         if not files_data:
             return {
@@ -26,35 +95,120 @@ class PRReviewerAgent:
                 "message": "No files to review in this PR"
             }
         
-        # Analyze each file
+        # Triage every file locally before anything reaches the model
+        with time_stage("triage"):
+            triage = [triage_file(file_data) for file_data in files_data]
+        changed_files = [file_data for file_data, decision in zip(files_data, triage) if decision["decision"] != SKIP]
+        decisions = [decision for decision in triage if decision["decision"] != SKIP]
+        
+        triage_summary = {
+            "skipped": [
+                {"filename": file_data["filename"], "reason": decision["reason"]}
+                for file_data, decision in zip(files_data, triage) if decision["decision"] == SKIP
+            ],
+            "static_only": [
+                {"filename": file_data["filename"], "reason": decision["reason"]}
+                for file_data, decision in zip(changed_files, decisions) if decision["decision"] == STATIC
+            ],
+            "llm_review": sum(1 for decision in decisions if decision["decision"] == LLM),
+            "model_reviews_avoided": sum(1 for decision in triage if decision["estimated_tokens_saved"]),
+            "estimated_tokens_saved": sum(decision["estimated_tokens_saved"] for decision in triage),
+        }
+        emit("pr_info", {"pr_info": pr_info, "files_to_review": len(changed_files), "triage": triage_summary})
+        
+        # Carry forward results for files whose patch is unchanged since the last review
+        previous = self.state_store.load(repo_name, pr_number) if self.state_store else None
+        previous_files = previous["files"] if previous else {}
+        patch_hashes = [patch_hash(file_data["patch"]) for file_data in changed_files]
+        
+        file_results: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]] = [None] * len(changed_files)
+        
+        def finish(index: int, result: Tuple[Dict[str, Any], Dict[str, Any]]):
+            file_results[index] = result
+            analysis, security_result = result
+            emit("file_analysis", {
+                "index": index,
+                "analysis": {**analysis, "triage": {"decision": decisions[index]["decision"], "reason": decisions[index]["reason"]}},
+                "security_issues": security_result["security_issues"],
+            })
+        
+        def reusable(index: int) -> Optional[Dict[str, Any]]:
+            recorded = previous_files.get(changed_files[index]["filename"])
+            if (decisions[index]["decision"] != STATIC and recorded and recorded["patch_hash"] == patch_hashes[index]
+                    and recorded.get("analysis_version") == ANALYSIS_VERSION):
+                return recorded
+            return None
+        
+        # Local AST/tokenizer checks of every file not reused, spread over worker processes;
+        # findings go into the model prompt and the file's analysis
+        if STATIC_ANALYSIS_ENABLED:
+            to_check = [index for index in range(len(changed_files)) if reusable(index) is None]
+            with time_stage("static_analysis"):
+                findings = run_static_analysis([changed_files[index] for index in to_check])
+            for index, file_findings in zip(to_check, findings):
+                changed_files[index] = {**changed_files[index], "static_findings": file_findings}
+        
+        fresh_indexes = []
+        for index, file_data in enumerate(changed_files):
+            recorded = reusable(index)
+            if decisions[index]["decision"] == STATIC:
+                finish(index, self._static_review(file_data, decisions[index]))
+            elif recorded is not None:
+                analysis = {**recorded["analysis"], "reused": True, "reused_from": previous["head_sha"]}
+                finish(index, (analysis, recorded["security_result"]))
+            else:
+                fresh_indexes.append(index)
+        
+        # Pack small patches into shared requests, then analyze the batches concurrently
+        fresh_files = [changed_files[index] for index in fresh_indexes]
+        batches = plan_batches([count_tokens(file_data["patch"]) for file_data in fresh_files])
+        
+        def batch_done(batch_index: int, results: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+            for i, result in zip(batches[batch_index], results):
+                finish(fresh_indexes[i], result)
+            # Raising here abandons the batches still queued in the engine
+            checkpoint()
+        
+        self.engine.map(
+            self._analyze_batch, [[fresh_files[i] for i in batch] for batch in batches], self._batch_failed,
+            on_result=batch_done, calls=expected_calls
+        )
+        
         file_analyses = []
         security_issues = []
         
-        for file_data in files_data:
-            if file_data["patch"]:  # Only analyze files with actual changes
-                # Code quality analysis
-                analysis = analyze_code_quality(
-                    file_data.get("content", ""), 
-                    file_data["filename"], 
-                    file_data["patch"]
-                )
-                file_analyses.append(analysis)
-                
-                # Security scan
-                security_result = scan_for_security_issues(
-                    file_data.get("content", ""), 
-                    file_data["filename"]
-                )
-                if security_result["security_issues"]:
-                    security_issues.extend(security_result["security_issues"])
+        for (analysis, security_result), decision in zip(file_results, decisions):
+            file_analyses.append({**analysis, "triage": {"decision": decision["decision"], "reason": decision["reason"]}})
+            if security_result["security_issues"]:
+                security_issues.extend(security_result["security_issues"])
+        emit("security_findings", {"security_issues": security_issues})
+        
+        incremental = {
+            "previous_head_sha": previous["head_sha"] if previous else None,
+            "head_sha": pr_info["head_sha"],
+            "fresh_files": [analysis["filename"] for analysis in file_analyses if not analysis.get("reused")],
+            "reused_files": [analysis["filename"] for analysis in file_analyses if analysis.get("reused")],
+        }
+        
+        if self.state_store:
+            self._record_state(repo_name, pr_number, pr_info["head_sha"], changed_files, patch_hashes, file_results)
         
-        # Test coverage analysis
-        test_coverage = analyze_test_coverage(files_data)
+        # Test coverage analysis, matching sources to tests across the base branch's tree
+        with time_stage("coverage_analysis"):
+            test_index = None
+            if TEST_INDEX_ENABLED:
+                try:
+                    test_index = get_test_index(self.github_token, repo_name, pr_info["base_sha"])
+                except Exception:
+                    test_index = None  # Fall back to the PR's own test files
+            test_coverage = analyze_test_coverage(files_data, test_index)
+        emit("test_coverage", test_coverage)
         
         # Generate comprehensive review
-        review_summary = self._generate_review_summary(
-            pr_info, file_analyses, security_issues, test_coverage
-        )
+        with time_stage("summary_generation"):
+            review_summary = self._generate_review_summary(
+                pr_info, file_analyses, security_issues, test_coverage, incremental, triage_summary
+            )
         
         review_result = {
             "pr_number": pr_number,
@@ -64,23 +218,122 @@ class PRReviewerAgent:
             "file_analyses": file_analyses,
             "security_issues": security_issues,
             "test_coverage": test_coverage,
+            "incremental": incremental,
+            "triage": triage_summary,
+            "cascade": summarize_cascade(file_analyses),
             "review_summary": review_summary,
             "recommendation": self._get_recommendation(file_analyses, security_issues, test_coverage)
         }
+        emit("recommendation", {"recommendation": review_result["recommendation"], "review_summary": review_summary})
         
-        # Post comment if requested
-        if post_comment:
-            comment_result = post_pr_comment(
-                self.github_token, repo_name, pr_number, review_summary
-            )
+        # Post comment if requested, unless it would describe a newer head than the one asked about
+        checkpoint()
+        if post_comment and head_sha is not None and pr_info["head_sha"] != head_sha:
+            review_result["comment_skipped"] = f"PR head moved from {head_sha[:7]} to {pr_info['head_sha'][:7]}"
+        elif post_comment:
+            with time_stage("comment_post"):
+                comment, sections = review_summary, None
+                if not fits_in_comment(review_summary):
+                    compact_summary = self._generate_review_summary(
+                        pr_info, file_analyses, security_issues, test_coverage, incremental, triage_summary,
+                        compact=True
+                    )
+                    comment, *sections = split_comment(compact_summary, self._file_sections(file_analyses))
+                comment_result = post_pr_comment(
+                    self.github_token, repo_name, pr_number, comment, sections
+                )
             review_result["comment_posted"] = comment_result
         
+        review_result["github_requests"] = get_github_client(self.github_token).pull_requests_used(repo_name, pr_number)
+        
+        # Best effort: the review (and its comment) already happened, a history failure must not undo that
+        if self.history:
+            try:
+                review_result["history_id"] = self.history.record(review_result)
+            except Exception as e:
+                logger.exception("Recording review of %s#%s in the history failed", repo_name, pr_number)
+                review_result["history_error"] = str(e)
+        
         return review_result
     
+    def _analyze_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Security scan and cascaded code quality analysis for one planned batch of changed files
+        
+        The scan runs first because its findings decide which files go straight to the large model.
+        """
+        security_results = [
+            scan_for_security_issues(
+                file_data.get("content", ""), 
+                file_data["filename"],
+                patch=file_data["patch"]
+            )
+            for file_data in batch
+        ]
+        analyses = analyze_with_cascade(batch, [result["security_issues"] for result in security_results])
+        analyses = [{**analysis, "static_findings": file_data.get("static_findings", [])}
+                    for analysis, file_data in zip(analyses, batch)]
+        return list(zip(analyses, security_results))
+    
+    def _static_review(self, file_data: Dict[str, Any], decision: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Security scan and local summary for a file triaged as not needing a model review"""
+        analysis = {
+            "filename": file_data["filename"],
+            "analysis": f"Static checks only ({decision['reason']}). {summarize_patch(file_data['patch'])}",
+            "static_only": True,
+            "static_findings": file_data.get("static_findings", [])
+        }
+        security_result = scan_for_security_issues(
+            file_data.get("content", ""), 
+            file_data["filename"],
+            patch=file_data["patch"]
+        )
+        return analysis, security_result
+    
+    def _record_state(self, repo_name: str, pr_number: int, head_sha: str,
+                      changed_files: List[Dict[str, Any]], patch_hashes: List[str],
+                      file_results: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Remember per-file results for the next review; failed analyses are left out so they are retried"""
+        files = {}
+        for file_data, file_hash, (analysis, security_result) in zip(changed_files, patch_hashes, file_results):
+            if analysis.get("error"):
+                continue
+            recorded = {key: value for key, value in analysis.items() if key not in ("reused", "reused_from", "triage")}
+            files[file_data["filename"]] = {
+                "patch_hash": file_hash,
+                "analysis_version": ANALYSIS_VERSION,
+                "analysis": recorded,
+                "security_result": security_result,
+            }
+        self.state_store.save(repo_name, pr_number, head_sha, files)
+    
+    def _batch_failed(self, batch: List[Dict[str, Any]], error: BaseException) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Fallback results for a batch whose analysis raised or timed out"""
+        results = []
+        for file_data in batch:
+            analysis = {
+                "filename": file_data["filename"],
+                "analysis": f"Error analyzing file: {str(error)}",
+                "error": True
+            }
+            # The security scan is local and cheap, so a failed LLM call doesn't lose its findings
+            security_result = scan_for_security_issues(
+                file_data.get("content", ""), 
+                file_data["filename"],
+                patch=file_data["patch"]
+            )
+            results.append((analysis, security_result))
+        return results
+    
     @operation
     def _generate_review_summary(self, pr_info: Dict, file_analyses: List[Dict], 
-                                security_issues: List[Dict], test_coverage: Dict) -> str:
-        """Generate a comprehensive review summary"""
+                                security_issues: List[Dict], test_coverage: Dict,
+                                incremental: Optional[Dict] = None, triage: Optional[Dict] = None,
+                                compact: bool = False) -> str:
+        """Generate a comprehensive review summary
+
+        `compact` lists changed files in one line each, leaving their analyses
+        to `_file_sections` for a summary too long for one PR comment.
+        """
         
         summary_parts = [
             f"## 🤖 AI Code Review Summary",
@@ -91,6 +344,21 @@ class PRReviewerAgent:
             f"",
         ]
         
+        if triage and (triage["skipped"] or triage["static_only"]):
+            summary_parts.extend([
+                f"**Triage:** {triage['llm_review']} files reviewed by the model, "
+                f"{len(triage['static_only'])} with static checks only, {len(triage['skipped'])} skipped",
+                f""
+            ])
+        
+        if incremental and incremental["reused_files"]:
+            summary_parts.extend([
+                f"**Incremental review** since `{incremental['previous_head_sha'][:7]}`: "
+                f"{len(incremental['fresh_files'])} files freshly analyzed, "
+                f"{len(incremental['reused_files'])} unchanged files reused from the previous review",
+                f""
+            ])
+        
         # Code Quality Section
         if file_analyses:
             summary_parts.extend([
@@ -100,12 +368,17 @@ class PRReviewerAgent:
             ])
             
             for analysis in file_analyses:
-                if not analysis.get("error"):
-                    summary_parts.append(f"**{analysis['filename']}:**")
-                    summary_parts.append(f"```")
-                    summary_parts.append(analysis['analysis'])
-                    summary_parts.append(f"```")
+                if analysis.get("error"):
+                    continue
+                if compact:
+                    findings = len(analysis.get("static_findings", []))
+                    findings_note = f" ({findings} static findings)" if findings else ""
+                    summary_parts.append(f"- `{analysis['filename']}`{findings_note}")
+                else:
+                    summary_parts.extend(self._file_section_lines(analysis))
                     summary_parts.append(f"")
+            if compact:
+                summary_parts.extend([f"", f"_Per-file analysis is in the follow-up comments below._", f""])
         
         # Security Issues Section
         if security_issues:
@@ -116,8 +389,13 @@ class PRReviewerAgent:
             ])
             
             for issue in security_issues:
-                severity_emoji = "🚨" if issue["severity"] == "high" else "⚠️"
-                summary_parts.append(f"{severity_emoji} **{issue['type'].replace('_', ' ').title()}**: `{issue['pattern']}`")
+                severity_emoji = "🚨" if is_serious(issue) else "⚠️"
+                location = f" in `{issue['filename']}` line {issue['line']}" if issue.get("line") else ""
+                # The matched text rather than the rule, which for regex rules is unreadable
+                matched = issue.get("match", issue["pattern"]).strip()
+                if len(matched) > 60:
+                    matched = matched[:57] + "..."
+                summary_parts.append(f"{severity_emoji} **{issue['type'].replace('_', ' ').title()}**: `{matched}`{location}")
             
             summary_parts.append(f"")
         
@@ -130,6 +408,17 @@ class PRReviewerAgent:
             f""
         ])
         
+        stale = [(source, mapping["existing_tests"][0]) for source, mapping in test_coverage.get("test_mapping", {}).items()
+                 if mapping["existing_tests"] and not mapping["updated_tests"]]
+        if stale:
+            summary_parts.append(f"- Existing tests not updated in this PR:")
+            summary_parts.extend(f"  - `{source}` → `{test}`" for source, test in stale[:10])
+        if test_coverage.get("untested_sources"):
+            untested = ", ".join(f"`{source}`" for source in test_coverage["untested_sources"][:10])
+            summary_parts.append(f"- No related tests found for: {untested}")
+        if stale or test_coverage.get("untested_sources"):
+            summary_parts.append(f"")
+        
         if test_coverage['coverage_assessment'] == 'missing':
             summary_parts.append(f"⚠️ **No tests found** - Consider adding tests for the changes.")
         elif test_coverage['coverage_assessment'] == 'needs_improvement':
@@ -137,12 +426,28 @@ class PRReviewerAgent:
         
         return "\n".join(summary_parts)
     
+    def _file_section_lines(self, analysis: Dict[str, Any]) -> List[str]:
+        reused_note = " _(unchanged, reused from previous review)_" if analysis.get("reused") else ""
+        lines = [f"**{analysis['filename']}:**{reused_note}", f"```", analysis['analysis'], f"```"]
+        for finding in analysis.get("static_findings", []):
+            location = f"line {finding['line']}: " if finding.get("line") else ""
+            lines.append(f"- 🔎 {location}{finding['message']} (`{finding['rule']}`)")
+        return lines
+    
+    def _file_sections(self, file_analyses: List[Dict]) -> List[str]:
+        """Collapsible per-file analyses for the follow-up comments of an oversized review"""
+        return [
+            "\n".join([f"<details><summary><code>{analysis['filename']}</code></summary>", f"",
+                       *self._file_section_lines(analysis), f"", f"</details>"])
+            for analysis in file_analyses if not analysis.get("error")
+        ]
+    
     @operation
     def _get_recommendation(self, file_analyses: List[Dict], security_issues: List[Dict], 
                           test_coverage: Dict) -> str:
         """Generate overall recommendation for the PR"""
         
-        high_security_issues = [issue for issue in security_issues if issue["severity"] == "high"]
+        high_security_issues = [issue for issue in security_issues if is_serious(issue)]
         
         if high_security_issues:
             return "CHANGES_REQUESTED - High severity security issues found"
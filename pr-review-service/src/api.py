@@ -1,14 +1,53 @@
-from fastapi import FastAPI, HTTPException
+import json
+import queue
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-import agentops
+from typing import Any, Dict, List, Optional
 from src.main import review_pull_request
-from config.settings import AGENTOPS_API_KEY
+from src.core.telemetry import end_trace, init_telemetry, start_trace
+from src.core.job_queue import ReviewJob, QueueFullError, COMPLETED
+from src.core.shared_queue import create_job_queue
+from src.core.analysis_cache import get_analysis_cache
+from src.core.review_history import get_review_history
+from src.core.rate_limiter import scheduler
+from src.core.metrics import registry
+from src.tools.github_client import get_github_client
+from src.tools.static_analysis import shutdown_static_pool
+from src.batch import resolve_targets, stream_reviews
+from src.webhooks import WebhookDebouncer, verify_signature
+from config.settings import (
+    GITHUB_TOKEN, SSE_KEEPALIVE_SECONDS, validate_settings, GITHUB_WEBHOOK_SECRET,
+    WEBHOOK_POST_COMMENT, REVIEW_HISTORY_MAX_PAGE_SIZE
+)
 
-app = FastAPI(title="PR Review Service", version="1.0.0")
 
-# Initialize AgentOps for the API
-agentops.init(AGENTOPS_API_KEY, auto_start_session=False, tags=["pr-review-api", "fastapi"])
+if __name__ == "__main__":
+    # Run as a script, this file would be the main module that every spawned static analysis
+    # process re-imports, setting up a job queue in each; serve from the package entry point instead
+    import runpy
+    runpy.run_module("src", run_name="__main__", alter_sys=True)
+    raise SystemExit
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifecycle: check settings, start telemetry once, run the review workers"""
+    validate_settings()
+    init_telemetry(tags=["pr-review-api", "fastapi"], auto_start_session=False)
+    job_queue.start()
+    try:
+        yield
+    finally:
+        webhook_debouncer.stop()
+        job_queue.stop(timeout=30)
+        shutdown_static_pool()
+
+
+app = FastAPI(title="PR Review Service", version="1.0.0", lifespan=lifespan)
 
 
 class PRReviewRequest(BaseModel):
@@ -17,6 +56,18 @@ class PRReviewRequest(BaseModel):
     post_comment: bool = True
 
 
+class PRRef(BaseModel):
+    repo_name: str
+    pr_number: int
+
+
+class BatchReviewRequest(BaseModel):
+    pull_requests: List[PRRef] = []
+    repos: List[str] = []
+    updated_since: Optional[datetime] = None
+    post_comment: bool = False
+
+
 class PRReviewResponse(BaseModel):
     status: str
     pr_number: int
@@ -26,42 +77,348 @@ class PRReviewResponse(BaseModel):
     security_issues_count: int
     test_coverage_assessment: str
     review_summary: Optional[str] = None
+    history_id: Optional[int] = None
 
 
-@app.post("/review", response_model=PRReviewResponse)
-async def review_pr(request: PRReviewRequest):
-    """Endpoint to review a pull request"""
-    
-    # Start AgentOps trace for this API request
-    tracer = agentops.start_trace(
-        trace_name=f"API_PR_Review_{request.repo_name}_{request.pr_number}",
+class ReviewJobResponse(BaseModel):
+    job_id: str
+    status: str
+    repo_name: str
+    pr_number: int
+    head_sha: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[PRReviewResponse] = None
+
+
+def build_review_response(result: Dict[str, Any], include_summary: bool) -> PRReviewResponse:
+    """Convert a review result dict into the API response model"""
+    if result.get("status") == "no_changes":
+        return PRReviewResponse(
+            status="no_changes",
+            pr_number=result["pr_number"],
+            repo_name=result["repo_name"],
+            recommendation=result["message"],
+            files_analyzed=0,
+            security_issues_count=0,
+            test_coverage_assessment="missing"
+        )
+
+    return PRReviewResponse(
+        status="success",
+        pr_number=result["pr_number"],
+        repo_name=result["repo_name"],
+        recommendation=result["recommendation"],
+        files_analyzed=result["files_analyzed"],
+        security_issues_count=len(result["security_issues"]),
+        test_coverage_assessment=result["test_coverage"]["coverage_assessment"],
+        review_summary=result["review_summary"] if include_summary else None,
+        history_id=result.get("history_id")
+    )
+
+
+def run_review_job(job: ReviewJob) -> Dict[str, Any]:
+    """Worker entry point: run one queued review inside its own AgentOps trace"""
+
+    tracer = start_trace(
+        trace_name=f"API_PR_Review_{job.repo_name}_{job.pr_number}",
         tags=["api-request", "pr-review"]
     )
-    
+
     try:
         result = review_pull_request(
+            repo_name=job.repo_name,
+            pr_number=job.pr_number,
+            post_comment=job.post_comment,
+            on_event=job.emit,
+            cancel_event=job.cancel_event,
+            head_sha=job.head_sha if job.head_pinned else None
+        )
+        result.setdefault("repo_name", job.repo_name)
+        result.setdefault("pr_number", job.pr_number)
+        end_trace(tracer, end_state="Success")
+        return result
+
+    except Exception:
+        end_trace(tracer, end_state="Fail")
+        raise
+
+
+job_queue = create_job_queue(handler=run_review_job)
+webhook_debouncer = WebhookDebouncer(job_queue, post_comment=WEBHOOK_POST_COMMENT)
+
+# pull_request actions that (re)start a review of the PR's head commit
+REVIEW_ACTIONS = {"opened", "synchronize"}
+
+
+def _cache_samples(key: str):
+    cache = get_analysis_cache()
+    return [({}, cache.stats()[key])] if cache is not None else []
+
+
+def _cache_lookups():
+    cache = get_analysis_cache()
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+
+
+registry.collector(
+    "pr_review_analysis_cache_lookups_total", "counter", "Analysis cache lookups by result", _cache_lookups
+)
+registry.collector(
+    "pr_review_analysis_cache_hit_ratio", "gauge", "Share of analysis cache lookups that were hits",
+    lambda: _cache_samples("hit_rate")
+)
+registry.collector(
+    "pr_review_analysis_cache_entries", "gauge", "Analyses currently cached",
+    lambda: _cache_samples("entries")
+)
+registry.collector(
+    "pr_review_queue_depth", "gauge", "Review jobs waiting for a worker",
+    lambda: [({}, job_queue.metrics()["queue_depth"])]
+)
+registry.collector(
+    "pr_review_jobs_running", "gauge", "Review jobs currently running",
+    lambda: [({}, job_queue.metrics()["running"])]
+)
+registry.collector(
+    "pr_review_rate_limit_wait_seconds_total", "counter", "Time calls waited for a rate-limit token",
+    lambda: [({"service": service}, stats["wait_seconds"]) for service, stats in scheduler.stats().items()]
+)
+registry.collector(
+    "pr_review_rate_limited_total", "counter", "Calls rejected by an upstream rate limit and retried",
+    lambda: [({"service": service}, stats["rate_limited"]) for service, stats in scheduler.stats().items()]
+)
+registry.collector(
+    "pr_review_github_requests_total", "counter", "GitHub REST calls issued",
+    lambda: [({}, get_github_client(GITHUB_TOKEN).request_count)] if GITHUB_TOKEN else []
+)
+
+
+def build_job_response(job: ReviewJob) -> ReviewJobResponse:
+    response = ReviewJobResponse(**job.to_dict())
+    if job.status == COMPLETED and job.result is not None:
+        response.result = build_review_response(job.result, include_summary=job.post_comment)
+    return response
+
+
+@app.post("/review", response_model=ReviewJobResponse, status_code=202)
+def review_pr(request: PRReviewRequest):
+    """Enqueue a pull request review and return its job id immediately"""
+    try:
+        job = job_queue.submit(
             repo_name=request.repo_name,
             pr_number=request.pr_number,
             post_comment=request.post_comment
         )
-        
-        response = PRReviewResponse(
-            status="success",
-            pr_number=result["pr_number"],
-            repo_name=result["repo_name"],
-            recommendation=result["recommendation"],
-            files_analyzed=result["files_analyzed"],
-            security_issues_count=len(result["security_issues"]),
-            test_coverage_assessment=result["test_coverage"]["coverage_assessment"],
-            review_summary=result["review_summary"] if request.post_comment else None
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return build_job_response(job)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/review/stream")
+def review_stream(request: PRReviewRequest):
+    """Run a review on the shared worker pool and push its parts over Server-Sent Events as they are ready
+    
+    Events: "queued", "pr_info", one "file_analysis" per file, "security_findings",
+    "test_coverage", "recommendation", then "complete" (or "error").
+    """
+    events: "queue.Queue" = queue.Queue()
+    try:
+        job = job_queue.submit(
+            repo_name=request.repo_name,
+            pr_number=request.pr_number,
+            post_comment=request.post_comment,
+            on_done=lambda job: events.put(None),
+            on_event=lambda event, data: events.put((event, data))
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    def stream():
+        yield sse_event("queued", build_job_response(job).model_dump())
+        while True:
+            try:
+                item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield sse_event(*item)
+
+        if job.status == COMPLETED and job.result is not None:
+            yield sse_event("complete", build_review_response(job.result, include_summary=True).model_dump())
+        else:
+            yield sse_event("error", {"job_id": job.job_id, "error": job.error})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/review/batch")
+def review_batch(request: BatchReviewRequest):
+    """Review many PRs on the shared worker pool, streaming one NDJSON line per PR as each finishes"""
+    if not request.pull_requests and not request.repos:
+        raise HTTPException(status_code=422, detail="Give pull_requests and/or repos")
+
+    updated_since = request.updated_since
+    if updated_since is not None and updated_since.tzinfo is None:
+        updated_since = updated_since.replace(tzinfo=timezone.utc)
+
+    try:
+        targets = resolve_targets(
+            [(pr.repo_name, pr.pr_number) for pr in request.pull_requests],
+            request.repos,
+            updated_since
         )
-        
-        agentops.end_trace(tracer, end_state="Success")
-        return response
-        
     except Exception as e:
-        agentops.end_trace(tracer, end_state="Fail")
-        raise HTTPException(status_code=500, detail=f"Review failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Listing pull requests failed: {str(e)}")
+
+    lines = (json.dumps(record) + "\n" for record in stream_reviews(job_queue, targets, request.post_comment))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.post("/webhook/github", status_code=202)
+async def github_webhook(request: Request):
+    """Receive GitHub `pull_request` events and review each PR's latest commit after a debounce window"""
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+
+    body = await request.body()
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return {"status": "pong"}
+    if event != "pull_request":
+        return {"status": "ignored", "reason": f"event {event!r} is not handled"}
+
+    try:
+        payload = json.loads(body)
+        action = payload["action"]
+        repo_name = payload["repository"]["full_name"]
+        pr_number = payload["pull_request"]["number"]
+        head_sha = payload["pull_request"]["head"]["sha"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed pull_request payload: {str(e)}")
+
+    if action == "closed":
+        # Cancelling may write to the shared SQLite queue, so keep it off the event loop
+        cancelled = await run_in_threadpool(webhook_debouncer.drop, repo_name, pr_number)
+        return {"status": "cancelled" if cancelled else "ignored", "repo_name": repo_name, "pr_number": pr_number}
+    if action not in REVIEW_ACTIONS:
+        return {"status": "ignored", "reason": f"action {action!r} is not handled"}
+
+    outcome = await run_in_threadpool(webhook_debouncer.push, repo_name, pr_number, head_sha)
+    return {"status": outcome, "repo_name": repo_name, "pr_number": pr_number, "head_sha": head_sha}
+
+
+@app.get("/webhook/metrics")
+async def webhook_metrics():
+    """Pending debounce timers, active webhook reviews, coalesced events and superseded reviews"""
+    return webhook_debouncer.stats()
+
+
+@app.get("/review/{job_id}", response_model=ReviewJobResponse)
+def get_review(job_id: str):
+    """Status and, once finished, result of a queued review"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Review job {job_id} not found")
+    return build_job_response(job)
+
+
+def _history():
+    history = get_review_history()
+    if history is None:
+        raise HTTPException(status_code=503, detail="Review history is disabled")
+    return history
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@app.get("/reviews")
+def list_reviews(repo_name: Optional[str] = None, pr_number: Optional[int] = None, head_sha: Optional[str] = None,
+                 recommendation: Optional[str] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, limit: int = Query(50, ge=1, le=REVIEW_HISTORY_MAX_PAGE_SIZE),
+                 cursor: Optional[str] = None):
+    """Past reviews from the history store, newest first; pass `next_cursor` back as `cursor` for the next page
+    
+    `recommendation` filters by verdict code (APPROVED, APPROVED_WITH_SUGGESTIONS,
+    NEEDS_IMPROVEMENT, CHANGES_REQUESTED). Neither GitHub nor the model is called.
+    """
+    try:
+        return _history().list_reviews(
+            repo_name=repo_name, pr_number=pr_number, head_sha=head_sha,
+            recommendation=recommendation.upper() if recommendation else None,
+            since=_epoch(since), until=_epoch(until), limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor!r}")
+
+
+@app.get("/reviews/stats")
+def review_history_stats():
+    """Stored reviews and the space saved by deduplicating analysis text"""
+    return _history().stats()
+
+
+@app.get("/reviews/{review_id}")
+def get_review_history_entry(review_id: int):
+    """A stored review with its summary, per-file analyses and security findings"""
+    review = _history().get_review(review_id)
+    if review is None:
+        raise HTTPException(status_code=404, detail=f"Review {review_id} not found in history")
+    return review
+
+
+@app.get("/queue/metrics")
+def queue_metrics():
+    """Queue depth, running reviews per repo and throughput counters"""
+    return job_queue.metrics()
+
+
+@app.get("/cache/metrics")
+def cache_metrics():
+    """Hit/miss counters and size of the LLM analysis cache"""
+    cache = get_analysis_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@app.get("/ratelimit/metrics")
+async def rate_limit_metrics():
+    """Token bucket state, waits and rate-limit retries per outbound service"""
+    return scheduler.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latency histograms, token usage, cache, queue and rate-limit metrics in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/health")
@@ -69,7 +426,3 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "PR Review Service"}
 
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
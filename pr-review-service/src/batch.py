@@ -0,0 +1,143 @@
+"""
+Batch reviews of many pull requests.
+
+Used by `POST /review/batch` and runnable as a CLI that prints one NDJSON
+line per PR as each review finishes:
+
+    python -m src.batch --repo owner/repo --updated-since 2024-01-01T00:00:00Z
+    python -m src.batch --pr owner/repo#12 --pr owner/other#7 --workers 8
+"""
+
+import argparse
+import json
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.main import review_pull_request
+from src.core.job_queue import ReviewJob, ReviewJobQueue, QueueFullError, COMPLETED
+from src.core.rate_limiter import BATCH
+from src.tools.github_client import get_github_client
+from config.settings import GITHUB_TOKEN, REVIEW_WORKERS, validate_settings
+
+
+def parse_since(value: Optional[str]) -> Optional[datetime]:
+    """ISO-8601 timestamp as an aware datetime; naive values are taken as UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def resolve_targets(pull_requests: Iterable[Tuple[str, int]], repos: Iterable[str],
+                    updated_since: Optional[datetime] = None) -> List[Tuple[str, int]]:
+    """Explicit PRs plus every open PR of `repos` updated since `updated_since`, without duplicates"""
+    client = get_github_client(GITHUB_TOKEN)
+    targets: List[Tuple[str, int]] = []
+    seen = set()
+
+    def add(target: Tuple[str, int]):
+        if target not in seen:
+            seen.add(target)
+            targets.append(target)
+
+    for target in pull_requests:
+        add(target)
+    for repo_name in repos:
+        for pr_number in client.list_open_pulls(repo_name, updated_since):
+            add((repo_name, pr_number))
+    return targets
+
+
+def job_record(job: ReviewJob) -> Dict[str, Any]:
+    """Compact per-PR line for the NDJSON stream"""
+    record = {
+        "repo_name": job.repo_name,
+        "pr_number": job.pr_number,
+        "status": job.status,
+        "duration_seconds": round(job.finished_at - job.started_at, 3) if job.finished_at and job.started_at else None,
+        "error": job.error,
+    }
+    if job.status == COMPLETED and job.result is not None:
+        result = job.result
+        record.update({
+            "recommendation": result.get("recommendation", result.get("message")),
+            "files_analyzed": result.get("files_analyzed", 0),
+            "security_issues_count": len(result.get("security_issues", [])),
+            "test_coverage_assessment": result.get("test_coverage", {}).get("coverage_assessment"),
+        })
+    return record
+
+
+def stream_reviews(job_queue: ReviewJobQueue, targets: List[Tuple[str, int]],
+                   post_comment: bool = False) -> Iterator[Dict[str, Any]]:
+    """Submit every target to the shared queue and yield each record as its review finishes
+
+    When the queue is full, submission waits for one of this batch's own
+    reviews to finish instead of failing, so a large sweep applies
+    backpressure rather than being rejected. Batch jobs run in the batch
+    priority lane, behind interactive reviews sharing the same queue.
+    """
+    finished: "queue.Queue[ReviewJob]" = queue.Queue()
+    outstanding = 0
+
+    for repo_name, pr_number in targets:
+        while True:
+            try:
+                job_queue.submit(repo_name, pr_number, post_comment=post_comment,
+                                 on_done=finished.put, priority=BATCH)
+                outstanding += 1
+                break
+            except QueueFullError as e:
+                if not outstanding:
+                    yield {"repo_name": repo_name, "pr_number": pr_number, "status": "rejected", "error": str(e)}
+                    break
+                yield job_record(finished.get())
+                outstanding -= 1
+
+    for _ in range(outstanding):
+        yield job_record(finished.get())
+
+
+def _parse_pr(value: str) -> Tuple[str, int]:
+    repo_name, _, number = value.rpartition("#")
+    if not repo_name or not number.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected owner/repo#number, got {value!r}")
+    return repo_name, int(number)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Review many pull requests and print NDJSON results")
+    parser.add_argument("--pr", action="append", type=_parse_pr, default=[], metavar="OWNER/REPO#N",
+                        help="Pull request to review (repeatable)")
+    parser.add_argument("--repo", action="append", default=[], metavar="OWNER/REPO",
+                        help="Review every open PR of this repository (repeatable)")
+    parser.add_argument("--updated-since", help="Only open PRs updated since this ISO-8601 time")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent reviews")
+    parser.add_argument("--post-comment", action="store_true", help="Post review comments on the PRs")
+    args = parser.parse_args(argv)
+
+    if not args.pr and not args.repo:
+        parser.error("give at least one --pr or --repo")
+    validate_settings()
+
+    def handler(job: ReviewJob) -> Dict[str, Any]:
+        return review_pull_request(job.repo_name, job.pr_number, post_comment=job.post_comment)
+
+    targets = resolve_targets(args.pr, args.repo, parse_since(args.updated_since))
+    job_queue = ReviewJobQueue(handler=handler, workers=args.workers or REVIEW_WORKERS, max_queued=0)
+    job_queue.start()
+
+    failed = 0
+    try:
+        for record in stream_reviews(job_queue, targets, post_comment=args.post_comment):
+            failed += record["status"] != COMPLETED
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+    finally:
+        job_queue.stop()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config.settings import (
+    ANALYSIS_CACHE_BACKEND, ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL
+)
+
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+def normalize_patch(patch: str) -> str:
+    """Canonical form of a patch for cache keys.
+
+    Hunk headers keep only their new-file start line, since analyses and
+    findings cite new-file line numbers; old-file offsets and counts (which
+    a rebase can change without moving the new code) are dropped. Line
+    endings are unified and trailing whitespace is stripped.
+    """
+    lines = []
+    for line in patch.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        lines.append(_HUNK_HEADER.sub(r"@@ +\1 @@", line.rstrip()))
+    return "\n".join(lines).strip("\n")
+
+
+def patch_hash(patch: str) -> str:
+    return hashlib.sha256(normalize_patch(patch).encode("utf-8")).hexdigest()
+
+
+def make_cache_key(model: str, prompt_version: str, filename: str, patch: str, context: Any = None) -> str:
+    """Key of an analysis; `context` is any other prompt input (such as static findings), hashed as JSON"""
+    context_hash = hashlib.sha256(json.dumps(context, sort_keys=True).encode("utf-8")).hexdigest() if context else ""
+    return hashlib.sha256(
+        f"{model}\0{prompt_version}\0{filename}\0{patch_hash(patch)}\0{context_hash}".encode("utf-8")
+    ).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU with size and TTL eviction"""
+
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES, ttl: float = ANALYSIS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> int:
+        """Store a value and return the number of entries evicted"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache that survives restarts; least recently used rows are evicted first"""
+
+    def __init__(self, path: str = ANALYSIS_CACHE_PATH, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+                 ttl: float = ANALYSIS_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed ON analysis_cache (accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            evicted = 0
+            if self.ttl:
+                evicted += self._conn.execute(
+                    "DELETE FROM analysis_cache WHERE stored_at < ?", (now - self.ttl,)
+                ).rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()
+            if count > self.max_entries:
+                evicted += self._conn.execute(
+                    "DELETE FROM analysis_cache WHERE key IN ("
+                    " SELECT key FROM analysis_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                ).rowcount
+            return evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+
+
+class AnalysisCache:
+    """Content-addressed cache of LLM analyses with hit/miss counters"""
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        evicted = self.backend.set(key, value)
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[AnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Process-wide cache built from settings; None when caching is disabled"""
+    global _cache
+    if ANALYSIS_CACHE_BACKEND == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            if ANALYSIS_CACHE_BACKEND == "sqlite":
+                backend = SQLiteCacheBackend()
+            elif ANALYSIS_CACHE_BACKEND == "memory":
+                backend = MemoryCacheBackend()
+            else:
+                raise ValueError(f"Unknown ANALYSIS_CACHE_BACKEND: {ANALYSIS_CACHE_BACKEND}")
+            _cache = AnalysisCache(backend)
+        return _cache
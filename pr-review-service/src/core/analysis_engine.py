@@ -0,0 +1,113 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from config.settings import ANALYSIS_MAX_IN_FLIGHT, ANALYSIS_CALL_TIMEOUT
+
+
+# Abandon flags of the engine items the current thread is working for (nested engines add theirs)
+_abandoned: contextvars.ContextVar[Tuple[threading.Event, ...]] = contextvars.ContextVar("analysis_abandoned", default=())
+
+
+class AnalysisAbandoned(TimeoutError):
+    """Raised inside an engine item that already timed out, so it stops making model calls"""
+
+
+def check_abandoned():
+    """Raise AnalysisAbandoned when an engine item this thread works for has timed out"""
+    if any(event.is_set() for event in _abandoned.get()):
+        raise AnalysisAbandoned("Analysis was abandoned after its timeout")
+
+
+class AnalysisEngine:
+    """Runs per-file review work on a bounded thread pool and returns results in input order"""
+
+    def __init__(self, max_in_flight: int = ANALYSIS_MAX_IN_FLIGHT,
+                 call_timeout: Optional[float] = ANALYSIS_CALL_TIMEOUT):
+        self.max_in_flight = max(1, max_in_flight)
+        self.call_timeout = call_timeout if call_timeout and call_timeout > 0 else None
+
+    def map(self, func: Callable[[Any], Any], items: Sequence[Any],
+            on_error: Callable[[Any, BaseException], Any],
+            on_result: Optional[Callable[[int, Any], None]] = None,
+            calls: Optional[Callable[[Any], int]] = None) -> List[Any]:
+        """Apply `func` to every item concurrently.
+
+        A call that raises or runs longer than its timeout (measured from when it
+        actually started, not when it was queued) is replaced by `on_error(item, exc)`
+        so one bad file never stalls or aborts the others. The timeout is
+        `call_timeout` times `calls(item)`, the number of sequential model calls
+        the item may make (one when `calls` is not given); a timed-out item's
+        later `check_abandoned()` calls raise, so it stops spending tokens.
+        `on_result(index, result)` is called from the calling thread as soon as
+        each item's result is known.
+        """
+        if not items:
+            return []
+
+        results: List[Any] = [None] * len(items)
+        started: Dict[int, float] = {}
+        timeouts = [self.call_timeout * max(1, calls(item)) if self.call_timeout and calls else self.call_timeout
+                    for item in items]
+        abandoned = [threading.Event() for _ in items]
+        lock = threading.Lock()
+
+        def run(index: int, item: Any) -> Any:
+            with lock:
+                started[index] = time.monotonic()
+            _abandoned.set(_abandoned.get() + (abandoned[index],))
+            return func(item)
+
+        pool = ThreadPoolExecutor(
+            max_workers=min(self.max_in_flight, len(items)),
+            thread_name_prefix="pr-analysis"
+        )
+        # Each call runs in a copy of the caller's context so its rate-limit lane carries over
+        futures: Dict[Future, int] = {
+            pool.submit(contextvars.copy_context().run, run, index, item): index
+            for index, item in enumerate(items)
+        }
+        pending = set(futures)
+        poll_interval = min(self.call_timeout / 4, 1.0) if self.call_timeout else None
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        results[index] = on_error(items[index], e)
+                    if on_result is not None:
+                        on_result(index, results[index])
+
+                if self.call_timeout:
+                    now = time.monotonic()
+                    with lock:
+                        expired = [
+                            future for future in pending
+                            if futures[future] in started
+                            and now - started[futures[future]] > timeouts[futures[future]]
+                        ]
+                    for future in expired:
+                        pending.discard(future)
+                        future.cancel()
+                        index = futures[future]
+                        abandoned[index].set()
+                        results[index] = on_error(
+                            items[index],
+                            TimeoutError(f"Analysis exceeded {timeouts[index]:g}s timeout")
+                        )
+                        if on_result is not None:
+                            on_result(index, results[index])
+        finally:
+            # Never block the review on a hung call; its thread finishes in the background
+            # but makes no further model calls
+            for event in abandoned:
+                event.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return results
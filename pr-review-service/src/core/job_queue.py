@@ -0,0 +1,355 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from config.settings import REVIEW_WORKERS, REVIEW_MAX_PER_REPO, REVIEW_QUEUE_MAX, REVIEW_JOB_RETENTION
+from src.core.rate_limiter import INTERACTIVE, priority_lane
+from src.core.metrics import QUEUE_WAIT_SECONDS, REVIEWS
+
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class ReviewCancelled(Exception):
+    """Raised inside a running review once its job has been cancelled"""
+
+
+@dataclass
+class ReviewJob:
+    """A single queued PR review and its outcome"""
+    repo_name: str
+    pr_number: int
+    post_comment: bool = True
+    priority: int = INTERACTIVE
+    # The commit the review was requested for, or once it has fetched the PR, the head it is reviewing
+    head_sha: Optional[str] = None
+    # Whether `head_sha` was given at submit; the review then only comments on that commit
+    head_pinned: bool = False
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    done_callbacks: List[Callable[["ReviewJob"], None]] = field(default_factory=list, repr=False)
+    event_callbacks: List[Callable[[str, Dict[str, Any]], None]] = field(default_factory=list, repr=False)
+    # Set by `ReviewJobQueue.cancel`; a running review checks it between stages
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def attach(self, on_done: Optional[Callable[["ReviewJob"], None]] = None,
+               on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """Add listeners; a caller deduplicated onto a running job only sees its later events"""
+        if on_done is not None:
+            self.done_callbacks.append(on_done)
+        if on_event is not None:
+            self.event_callbacks.append(on_event)
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """Pass a partial result to every event listener; handlers use this as the review's `on_event`"""
+        for callback in list(self.event_callbacks):
+            try:
+                callback(event, data)
+            except Exception:
+                pass
+
+    def covers(self, head_sha: Optional[str], post_comment: bool, priority: int) -> bool:
+        """Whether this unfinished job already does what a new request would
+
+        It must agree on commenting. A queued job covers the same commit, or any
+        request when it has no pinned commit (it fetches the latest head when it
+        starts). A running job may already have fetched an older head, so it
+        only covers the commit it is reviewing (pinned, or recorded once it has
+        fetched the PR), and only at the same or a more urgent priority (a
+        queued job is moved up instead).
+        """
+        if self.post_comment != post_comment:
+            return False
+        if self.status == QUEUED:
+            return self.head_sha is None or self.head_sha == head_sha
+        return head_sha is not None and self.head_sha == head_sha and self.priority <= priority
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "repo_name": self.repo_name,
+            "pr_number": self.pr_number,
+            "priority": self.priority,
+            "head_sha": self.head_sha,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+def resolved_head(event: str, data: Dict[str, Any]) -> Optional[str]:
+    """Head SHA a running review fetched, from its "pr_info" event"""
+    if event != "pr_info":
+        return None
+    return data.get("pr_info", {}).get("head_sha")
+
+
+def execute_job(handler: Callable[[ReviewJob], Dict[str, Any]], job: ReviewJob) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Run `handler(job)` in the job's priority lane; returns (status, result, error)"""
+    try:
+        with priority_lane(job.priority):
+            return COMPLETED, handler(job), None
+    except ReviewCancelled as e:
+        return CANCELLED, None, str(e)
+    except Exception as e:
+        return FAILED, None, str(e)
+
+
+def notify_done(job: ReviewJob):
+    for callback in list(job.done_callbacks):
+        try:
+            callback(job)
+        except Exception:
+            pass
+
+
+class ReviewJobQueue:
+    """In-process FIFO of review jobs drained by a pool of worker threads.
+
+    Workers take the oldest queued job whose repository is below
+    `max_per_repo` running reviews, so a burst from one busy repo cannot
+    occupy every worker while other repos wait. Interactive jobs are taken
+    before batch jobs, and each job's GitHub and OpenAI calls are scheduled
+    in its priority lane.
+
+    A request that an unfinished job already covers (same PR, commit and
+    commenting) is answered with that job instead of a second review. Jobs
+    for the same PR run one at a time, so a request that arrives while a
+    review is running waits for it and then only re-analyzes what changed.
+    """
+
+    def __init__(self, handler: Callable[[ReviewJob], Dict[str, Any]],
+                 workers: int = REVIEW_WORKERS, max_per_repo: int = REVIEW_MAX_PER_REPO,
+                 max_queued: int = REVIEW_QUEUE_MAX, retention: int = REVIEW_JOB_RETENTION):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_per_repo = max(1, max_per_repo)
+        self.max_queued = max_queued
+        self.retention = retention
+
+        self._queue: Deque[ReviewJob] = deque()
+        self._jobs: "OrderedDict[str, ReviewJob]" = OrderedDict()
+        self._running_per_repo: Dict[str, int] = {}
+        self._running_prs: Set[Tuple[str, int]] = set()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._deduplicated = 0
+        self._superseded = 0
+        self._total_wait = 0.0
+        self._started = 0
+
+    def start(self):
+        """Start the worker threads"""
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"review-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop accepting work and wait for running reviews to finish"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, repo_name: str, pr_number: int, post_comment: bool = True,
+               on_done: Optional[Callable[[ReviewJob], None]] = None,
+               priority: int = INTERACTIVE,
+               on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+               head_sha: Optional[str] = None, dedup: bool = True, supersede: bool = False) -> ReviewJob:
+        """Enqueue a review and return its job immediately
+
+        `on_done` is called from the worker thread once the job has completed or failed;
+        `on_event` receives the handler's partial results, and `head_sha` pins the
+        commit the review was requested for. With `dedup`, an unfinished job that
+        covers the same PR, commit and commenting (see `ReviewJob.covers`) is
+        returned with the callbacks attached, and moved up to `priority` if it
+        is still queued, instead of a new one. With `supersede`, unfinished jobs for the PR
+        pinned to any other commit are cancelled; jobs without a pinned commit are left alone.
+        """
+        with self._cond:
+            job = self._find_inflight(repo_name, pr_number, head_sha, post_comment, priority) if dedup else None
+            if job is not None:
+                job.attach(on_done, on_event)
+                job.priority = min(job.priority, priority)
+                self._deduplicated += 1
+            else:
+                if self.max_queued and len(self._queue) >= self.max_queued:
+                    raise QueueFullError(f"Review queue is full ({self.max_queued} jobs waiting)")
+                job = ReviewJob(repo_name=repo_name, pr_number=pr_number, post_comment=post_comment,
+                                priority=priority, head_sha=head_sha, head_pinned=head_sha is not None)
+                job.attach(on_done, on_event)
+                self._queue.append(job)
+                self._jobs[job.job_id] = job
+                self._evict_finished()
+                self._cond.notify()
+
+            stale = []
+            if supersede and head_sha is not None:
+                stale = [other for other in self._jobs.values()
+                         if other is not job and other.repo_name == repo_name and other.pr_number == pr_number
+                         and other.status in (QUEUED, RUNNING) and other.head_pinned and other.head_sha != head_sha]
+
+        for other in stale:
+            if self.cancel(other.job_id):
+                with self._cond:
+                    self._superseded += 1
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it is unknown or already finished
+
+        A queued job is dropped at once. A running job is only signalled: the
+        review stops at its next checkpoint and finishes as CANCELLED.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in (QUEUED, RUNNING):
+                return False
+            job.cancel_event.set()
+            if job.status == RUNNING:
+                return True
+            self._queue.remove(job)
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self._cancelled += 1
+
+        REVIEWS.inc(status=CANCELLED)
+        notify_done(job)
+        return True
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters"""
+        with self._cond:
+            queued_per_repo: Dict[str, int] = {}
+            for job in self._queue:
+                queued_per_repo[job.repo_name] = queued_per_repo.get(job.repo_name, 0) + 1
+            return {
+                "queue_depth": len(self._queue),
+                "running": sum(self._running_per_repo.values()),
+                "workers": self.workers,
+                "max_per_repo": self.max_per_repo,
+                "queued_per_repo": queued_per_repo,
+                "running_per_repo": dict(self._running_per_repo),
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "deduplicated": self._deduplicated,
+                "superseded": self._superseded,
+                "avg_queue_wait_seconds": self._total_wait / self._started if self._started else 0.0,
+            }
+
+    def _find_inflight(self, repo_name: str, pr_number: int, head_sha: Optional[str],
+                       post_comment: bool, priority: int) -> Optional[ReviewJob]:
+        """Unfinished, uncancelled job covering the request; caller holds the lock"""
+        for job in self._jobs.values():
+            if (job.repo_name == repo_name and job.pr_number == pr_number and job.status in (QUEUED, RUNNING)
+                    and not job.cancel_event.is_set() and job.covers(head_sha, post_comment, priority)):
+                return job
+        return None
+
+    def _next_job(self) -> Optional[ReviewJob]:
+        """Pop the oldest highest-priority job whose repo has a free slot and PR is not running; caller holds the lock"""
+        best = None
+        for job in self._queue:
+            if (self._running_per_repo.get(job.repo_name, 0) < self.max_per_repo
+                    and (job.repo_name, job.pr_number) not in self._running_prs):
+                if best is None or job.priority < best.priority:
+                    best = job
+                    if job.priority == INTERACTIVE:
+                        break
+        if best is not None:
+            self._queue.remove(best)
+        return best
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopping:
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                self._running_per_repo[job.repo_name] = self._running_per_repo.get(job.repo_name, 0) + 1
+                self._running_prs.add((job.repo_name, job.pr_number))
+                job.status = RUNNING
+                job.started_at = time.time()
+            QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+            job.attach(on_event=partial(self._resolve_head, job))
+
+            status, result, error = execute_job(self.handler, job)
+
+            with self._cond:
+                job.finished_at = time.time()
+                job.result = result
+                job.error = error
+                job.status = status
+                if status == COMPLETED:
+                    self._completed += 1
+                elif status == FAILED:
+                    self._failed += 1
+                else:
+                    self._cancelled += 1
+                self._total_wait += job.started_at - job.created_at
+                self._started += 1
+
+                remaining = self._running_per_repo[job.repo_name] - 1
+                if remaining:
+                    self._running_per_repo[job.repo_name] = remaining
+                else:
+                    del self._running_per_repo[job.repo_name]
+                self._running_prs.discard((job.repo_name, job.pr_number))
+                # A freed repo slot may unblock a job other workers skipped
+                self._cond.notify_all()
+
+            REVIEWS.inc(status=status)
+            notify_done(job)
+
+    def _resolve_head(self, job: ReviewJob, event: str, data: Dict[str, Any]):
+        """Record the head a job without a pinned commit fetched, so requests for it dedupe onto the job"""
+        head_sha = resolved_head(event, data)
+        if head_sha is not None:
+            with self._cond:
+                if job.head_sha is None:
+                    job.head_sha = head_sha
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit; caller holds the lock"""
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in (COMPLETED, FAILED, CANCELLED)][:excess]:
+            del self._jobs[job_id]
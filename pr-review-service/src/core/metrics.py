@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+
+# Seconds; spans a local scan (milliseconds) up to a slow model call (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+# (labels, value) pairs reported by a collector at scrape time
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, per label combination"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            # One count per bucket, then +Inf count and sum
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = self.header()
+        for key, values in sorted(series.items()):
+            labels = self._labels(key)
+            for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(values[-2])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format.
+
+    Instruments own their values; collectors are called at scrape time to
+    report state kept elsewhere (cache counters, queue depth) without
+    duplicating it.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Sample]]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, documentation: str, collect: Callable[[], Iterable[Sample]]):
+        """Report `collect()` samples as metric `name` ("gauge" or "counter") on every scrape; replaces any earlier one"""
+        with self._lock:
+            self._collectors[name] = (kind, documentation, collect)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, (kind, documentation, collect) in collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue  # A failing source must not break the whole scrape
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "pr_review_stage_duration_seconds",
+    "Time spent in each review stage",
+    ["stage"]
+)
+LLM_TOKENS = registry.counter(
+    "pr_review_llm_tokens_total",
+    "Tokens reported by the model API in response.usage",
+    ["kind"]
+)
+LLM_REQUESTS = registry.counter(
+    "pr_review_llm_requests_total",
+    "Model API requests by outcome",
+    ["outcome"]
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "pr_review_queue_wait_seconds",
+    "Time review jobs spent queued before a worker picked them up"
+)
+CASCADE_FILES = registry.counter(
+    "pr_review_cascade_files_total",
+    "Files analyzed by each model cascade tier (the tier whose answer was kept)",
+    ["tier"]
+)
+CASCADE_ESCALATIONS = registry.counter(
+    "pr_review_cascade_escalations_total",
+    "Files escalated to the large review model, by reason",
+    ["reason"]
+)
+COMMENT_PARTS = registry.counter(
+    "pr_review_comment_parts_total",
+    "Review comment parts by what posting did with them (created, updated, unchanged or deleted)",
+    ["action"]
+)
+REVIEWS = registry.counter(
+    "pr_review_jobs_total",
+    "Finished review jobs by final status",
+    ["status"]
+)
+
+
+def time_stage(stage: str):
+    """Context manager recording the enclosed block under `stage` in the stage histogram"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_usage(usage) -> int:
+    """Count prompt/completion tokens from an OpenAI `response.usage`; returns the total"""
+    if usage is None:
+        return 0
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt, kind="prompt")
+    LLM_TOKENS.inc(completion, kind="completion")
+    return getattr(usage, "total_tokens", prompt + completion) or 0
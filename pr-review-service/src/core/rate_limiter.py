@@ -0,0 +1,232 @@
+import contextvars
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from config.settings import (
+    GITHUB_RATE_PER_SECOND, GITHUB_RATE_BURST, OPENAI_RATE_PER_SECOND, OPENAI_RATE_BURST,
+    RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_MAX
+)
+
+
+# Priority lanes: lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+_lane: contextvars.ContextVar = contextvars.ContextVar("rate_limit_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def priority_lane(lane: int):
+    """Run the enclosed calls (and threads started with a copy of this context) in `lane`"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> int:
+    return _lane.get()
+
+
+class TokenBucket:
+    """Token bucket whose waiters are served by priority lane, then arrival order.
+
+    `pause_until` stops all grants until a time learned from rate-limit
+    headers (quota exhausted, or a retry-after from the server).
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.paused_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, lane: int = INTERACTIVE):
+        entry = (lane, next(self._sequence))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == entry and now >= self.paused_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    if now < self.paused_until:
+                        delay = self.paused_until - now
+                    elif self.tokens < 1:
+                        delay = (1 - self.tokens) / self.rate
+                    else:
+                        delay = None  # Waiting for a higher-priority waiter to take its token
+                    self._cond.wait(delay)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            with self._cond:
+                self.waits += 1
+                self.wait_seconds += waited
+
+    def pause(self, seconds: float):
+        """Grant nothing for `seconds` (extends, never shortens, an existing pause)"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "tokens": round(self.tokens, 2),
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "waiting": len(self._waiters),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds from "12", "1.5", "20ms" or OpenAI-style "6m0s" values"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header(headers: Mapping[str, Any], name: str) -> Optional[str]:
+    for key, value in headers.items():
+        if key.lower() == name:
+            return str(value)
+    return None
+
+
+def delay_from_headers(headers: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """Seconds to hold off according to rate-limit headers, or None if quota remains.
+
+    Understands `retry-after`, GitHub's `x-ratelimit-remaining` / `x-ratelimit-reset`
+    (epoch seconds) and OpenAI's `x-ratelimit-remaining-requests` /
+    `x-ratelimit-reset-requests` (durations).
+    """
+    if not headers:
+        return None
+
+    retry_after = _header(headers, "retry-after")
+    if retry_after is not None:
+        return _parse_duration(retry_after)
+
+    if _header(headers, "x-ratelimit-remaining") == "0":
+        reset = _header(headers, "x-ratelimit-reset")
+        if reset is not None:
+            return max(0.0, float(reset) - time.time())
+
+    for kind in ("requests", "tokens"):
+        if _header(headers, f"x-ratelimit-remaining-{kind}") == "0":
+            reset = _header(headers, f"x-ratelimit-reset-{kind}")
+            if reset is not None:
+                return _parse_duration(reset)
+    return None
+
+
+def _rate_limit_delay(error: Exception) -> Optional[float]:
+    """Backoff hint if `error` is a GitHub or OpenAI rate-limit response, else None"""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if status == 429:
+        return delay_from_headers(headers) or 0.0
+    if status == 403:
+        # GitHub signals both primary and secondary limits with 403
+        delay = delay_from_headers(headers)
+        if delay is not None:
+            return delay
+        if "rate limit" in str(getattr(error, "data", "") or error).lower():
+            return 0.0
+    return None
+
+
+class RateLimitScheduler:
+    """Shared token buckets for outbound GitHub and OpenAI calls"""
+
+    def __init__(self, buckets: Dict[str, TokenBucket], max_retries: int = RATE_LIMIT_MAX_RETRIES,
+                 backoff_base: float = RATE_LIMIT_BACKOFF_BASE, backoff_max: float = RATE_LIMIT_BACKOFF_MAX):
+        self.buckets = buckets
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limited = {service: 0 for service in buckets}
+        self.retries = {service: 0 for service in buckets}
+        self._lock = threading.Lock()
+
+    def observe(self, service: str, headers: Optional[Mapping[str, Any]]):
+        """Pause a service's bucket when response headers say its quota is exhausted"""
+        delay = delay_from_headers(headers)
+        if delay:
+            self.buckets[service].pause(delay)
+
+    def call(self, service: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `func` under the service's bucket, retrying rate-limit errors with jittered backoff"""
+        bucket = self.buckets[service]
+        lane = current_lane()
+        attempt = 0
+        while True:
+            bucket.acquire(lane)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                hinted = _rate_limit_delay(e)
+                if hinted is None or attempt >= self.max_retries:
+                    raise
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+                with self._lock:
+                    self.rate_limited[service] += 1
+                    self.retries[service] += 1
+                bucket.pause(max(hinted, backoff))
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                service: {
+                    **bucket.stats(),
+                    "rate_limited": self.rate_limited[service],
+                    "retries": self.retries[service],
+                }
+                for service, bucket in self.buckets.items()
+            }
+
+
+scheduler = RateLimitScheduler({
+    "github": TokenBucket(GITHUB_RATE_PER_SECOND, GITHUB_RATE_BURST),
+    "openai": TokenBucket(OPENAI_RATE_PER_SECOND, OPENAI_RATE_BURST),
+})
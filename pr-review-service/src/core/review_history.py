@@ -0,0 +1,248 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import REVIEW_HISTORY_PATH
+
+
+# Review columns returned by list queries; full texts and per-file rows only come with a single review
+_REVIEW_COLUMNS = (
+    "id", "repo_name", "pr_number", "head_sha", "base_sha", "title", "verdict", "recommendation",
+    "files_analyzed", "security_issues_count", "coverage_assessment", "tokens_used", "created_at"
+)
+# Per-file keys kept in their own columns rather than the `details` JSON
+_FILE_COLUMNS = ("filename", "analysis", "model_used", "tokens_used")
+
+
+def verdict(recommendation: str) -> str:
+    """Leading code of a recommendation ("APPROVED - Looks good to merge!" -> "APPROVED")"""
+    return recommendation.split(" - ", 1)[0].strip()
+
+
+def _encode_cursor(created_at: float, review_id: int) -> str:
+    return f"{created_at!r}:{review_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    created_at, review_id = cursor.rsplit(":", 1)
+    return float(created_at), int(review_id)
+
+
+class ReviewHistoryStore:
+    """Every finished review with its per-file analyses and security findings.
+
+    Reviews are indexed by repo and PR, head SHA, verdict and time, and listed
+    newest first with keyset pagination, so a page is read straight from an
+    index however long the history grows. Analysis texts and summaries are
+    stored once per distinct content (zlib-compressed, keyed by SHA-256) in
+    `review_texts`; re-reviews that reuse or repeat an analysis only add a
+    reference to it.
+    """
+
+    def __init__(self, path: str = REVIEW_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_texts ("
+                " hash TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reviews ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " repo_name TEXT NOT NULL, pr_number INTEGER NOT NULL,"
+                " head_sha TEXT, base_sha TEXT, title TEXT,"
+                " verdict TEXT NOT NULL, recommendation TEXT NOT NULL,"
+                " files_analyzed INTEGER NOT NULL, security_issues_count INTEGER NOT NULL,"
+                " coverage_assessment TEXT, tokens_used INTEGER NOT NULL,"
+                " summary_hash TEXT, details TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_files ("
+                " review_id INTEGER NOT NULL, position INTEGER NOT NULL, filename TEXT NOT NULL,"
+                " analysis_hash TEXT, model_used TEXT, tokens_used INTEGER NOT NULL, details TEXT NOT NULL,"
+                " PRIMARY KEY (review_id, position))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_findings ("
+                " review_id INTEGER NOT NULL, position INTEGER NOT NULL, filename TEXT,"
+                " line INTEGER, severity TEXT NOT NULL, type TEXT NOT NULL, details TEXT NOT NULL,"
+                " PRIMARY KEY (review_id, position))"
+            )
+            for name, columns in (
+                ("idx_reviews_pr", "repo_name, pr_number, created_at"),
+                ("idx_reviews_head_sha", "head_sha"),
+                ("idx_reviews_verdict", "verdict, created_at"),
+                ("idx_reviews_created", "created_at"),
+            ):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON reviews ({columns})")
+
+    def _store_text(self, text: Optional[str]) -> Optional[str]:
+        """Hash of `text`, storing its compressed body the first time it is seen"""
+        if text is None:
+            return None
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO review_texts (hash, body, size) VALUES (?, ?, ?)",
+            (digest, zlib.compress(data), len(data))
+        )
+        return digest
+
+    def _load_texts(self, hashes: List[Optional[str]]) -> Dict[str, str]:
+        wanted = sorted({digest for digest in hashes if digest})
+        if not wanted:
+            return {}
+        rows = self._conn.execute(
+            f"SELECT hash, body FROM review_texts WHERE hash IN ({','.join('?' * len(wanted))})", wanted
+        ).fetchall()
+        return {digest: zlib.decompress(body).decode("utf-8") for digest, body in rows}
+
+    def record(self, result: Dict[str, Any]) -> int:
+        """Store a finished review result; returns its history id"""
+        pr_info = result.get("pr_info", {})
+        file_analyses = result.get("file_analyses", [])
+        details = {key: result[key] for key in ("test_coverage", "incremental", "triage", "cascade") if key in result}
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO reviews (repo_name, pr_number, head_sha, base_sha, title, verdict, recommendation,"
+                " files_analyzed, security_issues_count, coverage_assessment, tokens_used, summary_hash,"
+                " details, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result["repo_name"], result["pr_number"], pr_info.get("head_sha"), pr_info.get("base_sha"),
+                    pr_info.get("title"), verdict(result["recommendation"]), result["recommendation"],
+                    result["files_analyzed"], len(result["security_issues"]),
+                    result["test_coverage"]["coverage_assessment"],
+                    sum(analysis.get("tokens_used", 0) for analysis in file_analyses if not analysis.get("reused")),
+                    self._store_text(result.get("review_summary")), json.dumps(details), time.time(),
+                )
+            )
+            review_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO review_files (review_id, position, filename, analysis_hash, model_used,"
+                " tokens_used, details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        review_id, position, analysis["filename"], self._store_text(analysis.get("analysis")),
+                        analysis.get("model_used"), analysis.get("tokens_used", 0),
+                        json.dumps({key: value for key, value in analysis.items() if key not in _FILE_COLUMNS}),
+                    )
+                    for position, analysis in enumerate(file_analyses)
+                ]
+            )
+            self._conn.executemany(
+                "INSERT INTO review_findings (review_id, position, filename, line, severity, type, details)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (review_id, position, issue.get("filename"), issue.get("line"), issue["severity"],
+                     issue["type"], json.dumps(issue))
+                    for position, issue in enumerate(result["security_issues"])
+                ]
+            )
+        return review_id
+
+    def list_reviews(self, repo_name: Optional[str] = None, pr_number: Optional[int] = None,
+                     head_sha: Optional[str] = None, recommendation: Optional[str] = None,
+                     since: Optional[float] = None, until: Optional[float] = None,
+                     limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of reviews, newest first, and the cursor of the next page (None on the last)
+
+        `recommendation` matches the verdict code, e.g. "APPROVED" or "CHANGES_REQUESTED".
+        """
+        clauses, params = [], []
+        for column, value in (("repo_name", repo_name), ("pr_number", pr_number), ("head_sha", head_sha),
+                              ("verdict", recommendation)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if cursor:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_REVIEW_COLUMNS)} FROM reviews{where}"
+                " ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+        reviews = [dict(zip(_REVIEW_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(reviews[-1]["created_at"], reviews[-1]["id"])
+        return {"reviews": reviews, "next_cursor": next_cursor}
+
+    def get_review(self, review_id: int) -> Optional[Dict[str, Any]]:
+        """A stored review with its summary, per-file analyses and security findings"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_REVIEW_COLUMNS)}, summary_hash, details FROM reviews WHERE id = ?",
+                (review_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, analysis_hash, model_used, tokens_used, details FROM review_files"
+                " WHERE review_id = ? ORDER BY position", (review_id,)
+            ).fetchall()
+            findings = self._conn.execute(
+                "SELECT details FROM review_findings WHERE review_id = ? ORDER BY position", (review_id,)
+            ).fetchall()
+            texts = self._load_texts([row[-2]] + [file_row[1] for file_row in files])
+
+        review = dict(zip(_REVIEW_COLUMNS, row))
+        review.update(json.loads(row[-1]))
+        review["review_summary"] = texts.get(row[-2])
+        review["file_analyses"] = [
+            {"filename": filename, "analysis": texts.get(analysis_hash), "model_used": model_used,
+             "tokens_used": tokens_used, **json.loads(details)}
+            for filename, analysis_hash, model_used, tokens_used, details in files
+        ]
+        review["security_issues"] = [json.loads(details) for (details,) in findings]
+        return review
+
+    def stats(self) -> Dict[str, Any]:
+        """Stored reviews, and how much repeated analysis text the deduplicated store avoided"""
+        with self._lock:
+            (reviews,) = self._conn.execute("SELECT COUNT(*) FROM reviews").fetchone()
+            texts, stored_bytes, text_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0), COALESCE(SUM(size), 0) FROM review_texts"
+            ).fetchone()
+            (referenced_bytes,) = self._conn.execute(
+                "SELECT COALESCE(SUM(t.size), 0) FROM ("
+                " SELECT analysis_hash AS hash FROM review_files WHERE analysis_hash IS NOT NULL"
+                " UNION ALL SELECT summary_hash FROM reviews WHERE summary_hash IS NOT NULL"
+                ") AS r JOIN review_texts AS t ON t.hash = r.hash"
+            ).fetchone()
+        return {
+            "reviews": reviews,
+            "distinct_texts": texts,
+            "text_bytes_referenced": referenced_bytes,
+            "text_bytes_stored": stored_bytes,
+            "compression_ratio": referenced_bytes / stored_bytes if stored_bytes else 0.0,
+        }
+
+
+_history: Optional[ReviewHistoryStore] = None
+_history_lock = threading.Lock()
+
+
+def get_review_history() -> Optional[ReviewHistoryStore]:
+    """Process-wide review history; None when it is disabled"""
+    global _history
+    if not REVIEW_HISTORY_PATH:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = ReviewHistoryStore()
+        return _history
@@ -0,0 +1,59 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from config.settings import REVIEW_STATE_PATH
+
+
+class ReviewStateStore:
+    """Last reviewed head SHA and per-file results for each pull request.
+
+    Files are keyed by filename and carry the hash of the patch they were
+    analyzed against, so the next review can tell which files changed.
+    """
+
+    def __init__(self, path: str = REVIEW_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS review_state ("
+                " repo_name TEXT NOT NULL, pr_number INTEGER NOT NULL,"
+                " head_sha TEXT NOT NULL, files TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (repo_name, pr_number))"
+            )
+
+    def load(self, repo_name: str, pr_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT head_sha, files FROM review_state WHERE repo_name = ? AND pr_number = ?",
+                (repo_name, pr_number)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"head_sha": row[0], "files": json.loads(row[1])}
+
+    def save(self, repo_name: str, pr_number: int, head_sha: str, files: Dict[str, Dict[str, Any]]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO review_state (repo_name, pr_number, head_sha, files, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (repo_name, pr_number, head_sha, json.dumps(files), time.time())
+            )
+
+
+_store: Optional[ReviewStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_review_state_store() -> Optional[ReviewStateStore]:
+    """Process-wide state store; None when incremental reviews are disabled"""
+    global _store
+    if not REVIEW_STATE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ReviewStateStore()
+        return _store
@@ -0,0 +1,461 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from config.settings import (
+    REVIEW_WORKERS, REVIEW_MAX_PER_REPO, REVIEW_QUEUE_MAX, REVIEW_JOB_RETENTION,
+    COORDINATION_BACKEND, COORDINATION_PATH, COORDINATION_POLL_SECONDS, COORDINATION_STALE_SECONDS
+)
+from src.core.rate_limiter import INTERACTIVE
+from src.core.metrics import QUEUE_WAIT_SECONDS, REVIEWS
+from src.core.job_queue import (
+    QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED, QueueFullError, ReviewJob, ReviewJobQueue,
+    execute_job, notify_done, resolved_head
+)
+
+
+_FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS review_jobs ("
+    " job_id TEXT PRIMARY KEY, repo_name TEXT NOT NULL, pr_number INTEGER NOT NULL, head_sha TEXT,"
+    " head_pinned INTEGER NOT NULL DEFAULT 0,"
+    " post_comment INTEGER NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL,"
+    " created_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT,"
+    # Process that must run the job because its callbacks live there (NULL: any process)
+    " owner TEXT,"
+    " worker TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS idx_review_jobs_claim ON review_jobs (status, priority, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_review_jobs_pr ON review_jobs (repo_name, pr_number, status)",
+    "CREATE INDEX IF NOT EXISTS idx_review_jobs_finished ON review_jobs (finished_at)",
+    "CREATE TABLE IF NOT EXISTS review_workers (process_id TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS review_job_stats (name TEXT PRIMARY KEY, value REAL NOT NULL)",
+]
+
+
+def _bump(conn: sqlite3.Connection, name: str, amount: float = 1):
+    conn.execute(
+        "INSERT INTO review_job_stats (name, value) VALUES (?, ?)"
+        " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+
+class SQLiteReviewJobQueue:
+    """Review queue shared by every worker process on a host through one SQLite file.
+
+    Drop-in for `ReviewJobQueue` when the API runs under several uvicorn
+    workers: any process can submit, each process runs its own worker threads
+    that claim jobs atomically, the per-repo limit and priority order hold
+    across processes, jobs for the same PR run one at a time, and an
+    unfinished job for the same `(repo, pr, head_sha)` is reused wherever it
+    runs. Jobs submitted with callbacks
+    (streams, batches, webhooks) are pinned to the submitting process. Each
+    process heartbeats; running jobs of a process that stops heartbeating are
+    queued again.
+    """
+
+    def __init__(self, handler: Callable[[ReviewJob], Dict[str, Any]],
+                 workers: int = REVIEW_WORKERS, max_per_repo: int = REVIEW_MAX_PER_REPO,
+                 max_queued: int = REVIEW_QUEUE_MAX, retention: int = REVIEW_JOB_RETENTION,
+                 path: str = COORDINATION_PATH, poll_interval: float = COORDINATION_POLL_SECONDS,
+                 stale_after: float = COORDINATION_STALE_SECONDS):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_per_repo = max(1, max_per_repo)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.path = path
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Jobs whose ReviewJob object lives here: pinned to this process or running in it
+        self._local: Dict[str, ReviewJob] = {}
+        self._local_lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            # Queue files created before commits could be pinned
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(review_jobs)")}
+            if "head_pinned" not in columns:
+                conn.execute("ALTER TABLE review_jobs ADD COLUMN head_pinned INTEGER NOT NULL DEFAULT 0")
+            # Registered from the start so jobs pinned here before `start` are not released as orphans
+            conn.execute(
+                "INSERT OR REPLACE INTO review_workers (process_id, heartbeat_at) VALUES (?, ?)",
+                (self.process_id, time.time())
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction holding the database lock, so a read-then-update is atomic across processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def start(self):
+        """Start this process's worker threads and heartbeat"""
+        with self._wake:
+            if self._threads:
+                return
+            self._stopping = False
+        self._heartbeat()
+        threads = [threading.Thread(target=self._monitor, name="review-coordination", daemon=True)]
+        threads += [threading.Thread(target=self._worker, name=f"review-worker-{index}", daemon=True)
+                    for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop claiming work, wait for running reviews and unregister; queued jobs stay for other processes"""
+        with self._wake:
+            self._stopping = True
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM review_workers WHERE process_id = ?", (self.process_id,))
+
+    def submit(self, repo_name: str, pr_number: int, post_comment: bool = True,
+               on_done: Optional[Callable[[ReviewJob], None]] = None,
+               priority: int = INTERACTIVE,
+               on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+               head_sha: Optional[str] = None, dedup: bool = True, supersede: bool = False) -> ReviewJob:
+        """Enqueue a review for any process to run; same arguments as `ReviewJobQueue.submit`
+
+        A job with callbacks is only deduplicated onto a job this process holds,
+        since callbacks cannot reach another process.
+        """
+        pinned = on_done is not None or on_event is not None
+        job = None
+        cancelled: List[str] = []
+        with self._transaction() as conn:
+            if dedup:
+                row = conn.execute(
+                    "SELECT * FROM review_jobs WHERE repo_name = ? AND pr_number = ?"
+                    " AND post_comment = ? AND cancel_requested = 0"
+                    " AND ((status = ? AND (head_sha IS NULL OR head_sha IS ?))"
+                    "  OR (status = ? AND head_sha = ? AND priority <= ?))"
+                    " ORDER BY created_at LIMIT 1",
+                    (repo_name, pr_number, int(post_comment), QUEUED, head_sha, RUNNING, head_sha, priority)
+                ).fetchone()
+                if row is not None:
+                    with self._local_lock:
+                        local = self._local.get(row["job_id"])
+                    if local is not None:
+                        job = local
+                        job.attach(on_done, on_event)
+                    elif not pinned:
+                        job = self._job_from_row(row)
+                    if job is not None:
+                        _bump(conn, "deduplicated")
+                        if row["status"] == QUEUED and priority < row["priority"]:
+                            conn.execute("UPDATE review_jobs SET priority = ? WHERE job_id = ?", (priority, row["job_id"]))
+                            job.priority = priority
+
+            if job is None:
+                if self.max_queued:
+                    (queued,) = conn.execute("SELECT COUNT(*) FROM review_jobs WHERE status = ?", (QUEUED,)).fetchone()
+                    if queued >= self.max_queued:
+                        raise QueueFullError(f"Review queue is full ({self.max_queued} jobs waiting)")
+                job = ReviewJob(repo_name=repo_name, pr_number=pr_number, post_comment=post_comment,
+                                priority=priority, head_sha=head_sha, head_pinned=head_sha is not None)
+                job.attach(on_done, on_event)
+                conn.execute(
+                    "INSERT INTO review_jobs (job_id, repo_name, pr_number, head_sha, head_pinned, post_comment,"
+                    " priority, status, created_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.job_id, repo_name, pr_number, head_sha, int(job.head_pinned), int(post_comment), priority,
+                     QUEUED, job.created_at, self.process_id if pinned else None)
+                )
+                if pinned:
+                    with self._local_lock:
+                        self._local[job.job_id] = job
+
+            if supersede and head_sha is not None:
+                stale = conn.execute(
+                    "SELECT job_id, status, owner FROM review_jobs WHERE repo_name = ? AND pr_number = ?"
+                    " AND status IN (?, ?) AND job_id != ? AND head_pinned = 1 AND head_sha != ?",
+                    (repo_name, pr_number, QUEUED, RUNNING, job.job_id, head_sha)
+                ).fetchall()
+                for row in stale:
+                    if self._cancel_row(conn, row):
+                        cancelled.append(row["job_id"])
+                    _bump(conn, "superseded")
+
+        for job_id in cancelled:
+            self._finish_local_cancel(job_id)
+        with self._wake:
+            self._wake.notify()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job in any process; returns False if it is unknown or already finished
+
+        A queued job is dropped at once (by its owning process if it is pinned
+        elsewhere); a running job stops at its next checkpoint.
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT job_id, status, owner FROM review_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None or row["status"] not in (QUEUED, RUNNING):
+                return False
+            cancelled_here = self._cancel_row(conn, row)
+        if cancelled_here:
+            self._finish_local_cancel(job_id)
+        else:
+            with self._local_lock:
+                local = self._local.get(job_id)
+            if local is not None and local.status == RUNNING:
+                local.cancel_event.set()
+        return True
+
+    def _cancel_row(self, conn: sqlite3.Connection, row: sqlite3.Row) -> bool:
+        """Flag a job as cancelled; returns True when this process finalized a queued job itself"""
+        if row["status"] == QUEUED and row["owner"] in (None, self.process_id):
+            conn.execute(
+                "UPDATE review_jobs SET status = ?, finished_at = ?, cancel_requested = 1 WHERE job_id = ?",
+                (CANCELLED, time.time(), row["job_id"])
+            )
+            _bump(conn, CANCELLED)
+            return True
+        # Running somewhere, or queued and pinned to another process: its process acts on the flag
+        conn.execute("UPDATE review_jobs SET cancel_requested = 1 WHERE job_id = ?", (row["job_id"],))
+        return False
+
+    def _finish_local_cancel(self, job_id: str):
+        REVIEWS.inc(status=CANCELLED)
+        with self._local_lock:
+            job = self._local.pop(job_id, None)
+        if job is not None:
+            job.cancel_event.set()
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            notify_done(job)
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        with self._local_lock:
+            local = self._local.get(job_id)
+        if local is not None:
+            return local
+        rows = self._query("SELECT * FROM review_jobs WHERE job_id = ?", (job_id,))
+        return self._job_from_row(rows[0]) if rows else None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters across every process sharing the queue"""
+        queued_per_repo: Dict[str, int] = {}
+        running_per_repo: Dict[str, int] = {}
+        for row in self._query(
+            "SELECT status, repo_name, COUNT(*) AS jobs FROM review_jobs WHERE status IN (?, ?)"
+            " GROUP BY status, repo_name", (QUEUED, RUNNING)
+        ):
+            target = queued_per_repo if row["status"] == QUEUED else running_per_repo
+            target[row["repo_name"]] = row["jobs"]
+        stats = {row["name"]: row["value"] for row in self._query("SELECT name, value FROM review_job_stats")}
+        processes = self._query("SELECT COUNT(*) FROM review_workers")[0][0]
+        started = stats.get("started", 0)
+        return {
+            "backend": "sqlite",
+            "processes": processes,
+            "queue_depth": sum(queued_per_repo.values()),
+            "running": sum(running_per_repo.values()),
+            "workers": self.workers,
+            "max_per_repo": self.max_per_repo,
+            "queued_per_repo": queued_per_repo,
+            "running_per_repo": running_per_repo,
+            "completed": int(stats.get(COMPLETED, 0)),
+            "failed": int(stats.get(FAILED, 0)),
+            "cancelled": int(stats.get(CANCELLED, 0)),
+            "deduplicated": int(stats.get("deduplicated", 0)),
+            "superseded": int(stats.get("superseded", 0)),
+            "avg_queue_wait_seconds": stats.get("total_wait", 0.0) / started if started else 0.0,
+        }
+
+    def _job_from_row(self, row: sqlite3.Row) -> ReviewJob:
+        return ReviewJob(
+            repo_name=row["repo_name"],
+            pr_number=row["pr_number"],
+            post_comment=bool(row["post_comment"]),
+            priority=row["priority"],
+            head_sha=row["head_sha"],
+            head_pinned=bool(row["head_pinned"]),
+            job_id=row["job_id"],
+            status=row["status"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+    def _claim(self) -> Optional[ReviewJob]:
+        """Atomically take the oldest highest-priority job whose repo is below its running limit and PR is idle"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM review_jobs AS job WHERE status = ? AND cancel_requested = 0"
+                " AND (owner IS NULL OR owner = ?)"
+                " AND (SELECT COUNT(*) FROM review_jobs AS running"
+                "      WHERE running.repo_name = job.repo_name AND running.status = ?) < ?"
+                " AND NOT EXISTS (SELECT 1 FROM review_jobs AS same WHERE same.repo_name = job.repo_name"
+                "      AND same.pr_number = job.pr_number AND same.status = ?)"
+                " ORDER BY priority, created_at LIMIT 1",
+                (QUEUED, self.process_id, RUNNING, self.max_per_repo, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE review_jobs SET status = ?, started_at = ?, worker = ? WHERE job_id = ?",
+                (RUNNING, now, self.process_id, row["job_id"])
+            )
+            _bump(conn, "started")
+            _bump(conn, "total_wait", now - row["created_at"])
+
+        with self._local_lock:
+            job = self._local.get(row["job_id"]) or self._job_from_row(row)
+            self._local[job.job_id] = job
+        job.status = RUNNING
+        job.started_at = now
+        job.attach(on_event=partial(self._resolve_head, job))
+        return job
+
+    def _resolve_head(self, job: ReviewJob, event: str, data: Dict[str, Any]):
+        """Record the head a job without a pinned commit fetched, on the job and its row, so requests dedupe onto it"""
+        head_sha = resolved_head(event, data)
+        if head_sha is None or job.head_sha is not None:
+            return
+        job.head_sha = head_sha
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE review_jobs SET head_sha = ? WHERE job_id = ? AND head_sha IS NULL", (head_sha, job.job_id)
+            )
+
+    def _worker(self):
+        while True:
+            with self._wake:
+                if self._stopping:
+                    return
+            job = self._claim()
+            if job is None:
+                with self._wake:
+                    if not self._stopping:
+                        self._wake.wait(self.poll_interval)
+                continue
+
+            QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+            status, result, error = execute_job(self.handler, job)
+            job.finished_at = time.time()
+            job.result = result
+            job.error = error
+            job.status = status
+
+            with self._transaction() as conn:
+                conn.execute(
+                    "UPDATE review_jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+                    (status, job.finished_at, json.dumps(result, default=str) if result is not None else None,
+                     error, job.job_id)
+                )
+                _bump(conn, status)
+                conn.execute(
+                    "DELETE FROM review_jobs WHERE job_id IN ("
+                    " SELECT job_id FROM review_jobs WHERE status IN (?, ?, ?)"
+                    " ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                    _FINISHED + (self.retention,)
+                )
+            with self._local_lock:
+                self._local.pop(job.job_id, None)
+            with self._wake:
+                # A freed repo slot may unblock a job other workers skipped
+                self._wake.notify_all()
+
+            REVIEWS.inc(status=status)
+            notify_done(job)
+
+    def _heartbeat(self):
+        """Mark this process alive and recover work from processes that stopped heartbeating"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO review_workers (process_id, heartbeat_at) VALUES (?, ?)",
+                (self.process_id, now)
+            )
+            conn.execute("DELETE FROM review_workers WHERE heartbeat_at < ?", (now - self.stale_after,))
+            # Their callbacks died with them, so the jobs become claimable by anyone
+            conn.execute(
+                "UPDATE review_jobs SET status = ?, started_at = NULL, worker = NULL, owner = NULL"
+                " WHERE status = ? AND worker NOT IN (SELECT process_id FROM review_workers)",
+                (QUEUED, RUNNING)
+            )
+            conn.execute(
+                "UPDATE review_jobs SET owner = NULL WHERE status = ? AND owner IS NOT NULL"
+                " AND owner NOT IN (SELECT process_id FROM review_workers)",
+                (QUEUED,)
+            )
+            flagged = conn.execute(
+                "SELECT job_id, status FROM review_jobs WHERE cancel_requested = 1 AND status IN (?, ?)"
+                " AND (worker = ? OR owner = ? OR (status = ? AND owner IS NULL))",
+                (QUEUED, RUNNING, self.process_id, self.process_id, QUEUED)
+            ).fetchall()
+            cancelled = []
+            for row in flagged:
+                if row["status"] == QUEUED:
+                    conn.execute(
+                        "UPDATE review_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                        (CANCELLED, now, row["job_id"])
+                    )
+                    _bump(conn, CANCELLED)
+                    cancelled.append(row["job_id"])
+
+        for row in flagged:
+            if row["status"] == RUNNING:
+                with self._local_lock:
+                    job = self._local.get(row["job_id"])
+                if job is not None:
+                    job.cancel_event.set()
+        for job_id in cancelled:
+            self._finish_local_cancel(job_id)
+
+    def _monitor(self):
+        while True:
+            with self._wake:
+                if self._stopping:
+                    return
+                self._wake.wait(self.poll_interval)
+            try:
+                self._heartbeat()
+            except sqlite3.Error:
+                pass  # Busy database; try again next interval
+
+
+def create_job_queue(handler: Callable[[ReviewJob], Dict[str, Any]]):
+    """The review queue for this deployment: per process, or shared through SQLite across worker processes"""
+    if COORDINATION_BACKEND == "sqlite":
+        return SQLiteReviewJobQueue(handler)
+    if COORDINATION_BACKEND == "memory":
+        return ReviewJobQueue(handler)
+    raise ValueError(f"Unknown COORDINATION_BACKEND: {COORDINATION_BACKEND}")
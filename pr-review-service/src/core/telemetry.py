@@ -0,0 +1,62 @@
+"""
+AgentOps integration behind an explicit lifecycle.
+
+Nothing here talks to AgentOps at import time: `init_telemetry` is called
+once by whoever owns the process (the API lifespan hook, the CLI, the first
+library call) and is a no-op when telemetry is disabled. With
+`TELEMETRY_ENABLED=false` the AgentOps SDK is never imported and the
+decorators below leave functions and classes untouched.
+"""
+
+import threading
+from typing import Any, List, Optional
+from config.settings import AGENTOPS_API_KEY, TELEMETRY_ENABLED
+
+
+def _passthrough(*args, **kwargs):
+    """Stand-in for the AgentOps decorators, usable bare (`@agent`) or called (`@tool(name=...)`)"""
+    if len(args) == 1 and not kwargs and callable(args[0]):
+        return args[0]
+    return lambda wrapped: wrapped
+
+
+if TELEMETRY_ENABLED:
+    from agentops.sdk.decorators import agent, operation, tool, trace
+else:
+    agent = operation = tool = trace = _passthrough
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def telemetry_active() -> bool:
+    return TELEMETRY_ENABLED and bool(AGENTOPS_API_KEY)
+
+
+def init_telemetry(tags: List[str], auto_start_session: bool = True) -> bool:
+    """Initialize AgentOps once per process; returns whether telemetry is active"""
+    global _initialized
+    if not telemetry_active():
+        return False
+    with _init_lock:
+        if not _initialized:
+            import agentops
+            agentops.init(AGENTOPS_API_KEY, auto_start_session=auto_start_session, tags=tags)
+            _initialized = True
+    return True
+
+
+def start_trace(trace_name: str, tags: List[str]) -> Optional[Any]:
+    """Start an AgentOps trace, or return None when telemetry is off"""
+    if not _initialized:
+        return None
+    import agentops
+    return agentops.start_trace(trace_name=trace_name, tags=tags)
+
+
+def end_trace(tracer: Optional[Any], end_state: str):
+    if tracer is None:
+        return
+    import agentops
+    agentops.end_trace(tracer, end_state=end_state)
@@ -88,13 +88,25 @@ async def example_api_usage():
                 }
             )
             
-            if response.status_code == 200:
-                result = response.json()
+            if response.status_code != 202:
+                print(f"API Error: {response.status_code} - {response.text}")
+                return
+            
+            # Reviews run in the background; poll the job until it finishes
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"http://localhost:8000/review/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(2)
+            
+            if job["status"] == "completed":
+                result = job["result"]
                 print(f"API Review Result: {result['recommendation']}")
                 print(f"Files Analyzed: {result['files_analyzed']}")
                 print(f"Security Issues: {result['security_issues_count']}")
             else:
-                print(f"API Error: {response.status_code} - {response.text}")
+                print(f"Review failed: {job['error']}")
                 
         except Exception as e:
             print(f"API request failed: {e}")
@@ -1,16 +1,20 @@
-import agentops
-from agentops.sdk.decorators import trace
+from src.core.telemetry import init_telemetry, trace
 from src.agents.pr_reviewer_agent import PRReviewerAgent
-from config.settings import AGENTOPS_API_KEY, GITHUB_TOKEN
-
-
-# Initialize AgentOps
-agentops.init(AGENTOPS_API_KEY, tags=["pr-review", "github", "code-analysis"])
+from config.settings import GITHUB_TOKEN, validate_settings
 
 
 @trace(name="PRReviewWorkflow", tags=["main-workflow"])
-def review_pull_request(repo_name: str, pr_number: int, post_comment: bool = True):
-    """Main workflow for reviewing a pull request"""
+def review_pull_request(repo_name: str, pr_number: int, post_comment: bool = True, on_event=None,
+                        cancel_event=None, head_sha=None):
+    """Main workflow for reviewing a pull request
+    
+    `on_event(event, data)` optionally receives partial results as the review progresses;
+    setting `cancel_event` stops the review at its next checkpoint. With `head_sha`, the
+    comment is only posted if the PR's head is still that commit.
+    """
+    validate_settings()
+    # No-op when the process (e.g. the API lifespan) already initialized telemetry
+    init_telemetry(tags=["pr-review", "github", "code-analysis"])
     
     # Create PR reviewer agent
     reviewer = PRReviewerAgent(
@@ -23,7 +27,10 @@ def review_pull_request(repo_name: str, pr_number: int, post_comment: bool = Tru
         review_result = reviewer.review_pull_request(
             repo_name=repo_name,
             pr_number=pr_number,
-            post_comment=post_comment
+            post_comment=post_comment,
+            on_event=on_event,
+            cancel_event=cancel_event,
+            head_sha=head_sha
         )
         
         return review_result
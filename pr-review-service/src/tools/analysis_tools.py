@@ -1,22 +1,66 @@
-from typing import List, Dict, Any
-from agentops.sdk.decorators import tool
-import openai
-from config.settings import OPENAI_API_KEY
+import hashlib
+import json
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from src.core.telemetry import tool
+from config.settings import (
+    OPENAI_API_KEY, ANALYSIS_CALL_TIMEOUT, ANALYSIS_MAX_TOKENS, BATCH_RESPONSE_TOKENS_PER_FILE,
+    LARGE_PATCH_TOKENS, CHUNK_TOKENS, CHUNK_MAX_IN_FLIGHT, CASCADE_MODE, CASCADE_FAST_MODEL
+)
+from src.core.analysis_cache import AnalysisCache, get_analysis_cache, make_cache_key
+from src.tools.security_scanner import DEFAULT_SCANNER
+from src.tools.diff_parser import format_numbered_patch, iter_added_lines
+from src.tools.batching import FILE_MARKER, build_batch_section, count_tokens, split_batch_response
+from src.tools.chunking import chunk_patch
+from src.tools.static_analysis import format_findings, static_fingerprint
+from src.tools.test_index import RepoTestIndex, is_test_path, is_test_support_path, source_key, test_key
+from src.tools.cascade import (
+    FAST, HEURISTIC, LARGE, assess_risk, cascade_fingerprint, heuristic_analysis, parse_quality_score,
+    risk_reasons, score_reasons
+)
+from src.core.analysis_engine import AnalysisEngine, check_abandoned
+from src.core.rate_limiter import scheduler
+from src.core.metrics import CASCADE_ESCALATIONS, CASCADE_FILES, LLM_REQUESTS, record_usage, time_stage
 
-openai.api_key = OPENAI_API_KEY
+# Client used for completions; anything exposing `chat.completions.with_raw_response.create`
+_openai_client: Any = None
 
 
-@tool(name="CodeAnalysisTool", cost=0.10)
-def analyze_code_quality(file_content: str, filename: str, patch: str) -> Dict[str, Any]:
-    """Analyze code quality and provide suggestions"""
-    
-    prompt = f"""
-    Please analyze the following code changes and provide feedback:
+def set_openai_client(client: Any):
+    """Send completions through `client` instead of the openai module (benchmarks use a local fake)"""
+    global _openai_client
+    _openai_client = client
 
-    File: {filename}
-    
-    Code Changes (Patch):
-    {patch}
+
+def get_openai_client() -> Any:
+    """The completions client, importing and configuring the openai SDK on first use"""
+    global _openai_client
+    if _openai_client is None:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        # Rate-limit retries and backoff are handled by the shared scheduler
+        openai.max_retries = 0
+        _openai_client = openai
+    return _openai_client
+
+
+CODE_REVIEW_MODEL = "gpt-4"
+# Bump whenever the prompt below changes so cached analyses are not reused. The settings that
+# size prompts and answers are part of it; static findings go into each cache key instead
+PROMPT_VERSION = "3-" + hashlib.sha256(json.dumps([
+    ANALYSIS_MAX_TOKENS, BATCH_RESPONSE_TOKENS_PER_FILE, LARGE_PATCH_TOKENS, CHUNK_TOKENS
+]).encode("utf-8")).hexdigest()[:8]
+# Recorded with per-file results; earlier results are only reused under the same version
+ANALYSIS_VERSION = (
+    f"{CODE_REVIEW_MODEL}:{PROMPT_VERSION}:{DEFAULT_SCANNER.fingerprint}:{cascade_fingerprint()}:{static_fingerprint()}"
+)
+
+SYSTEM_PROMPT = "You are a senior software engineer reviewing code. Provide constructive, detailed feedback."
+
+# Shared by single-file and batched prompts so both produce equivalent per-file analyses
+REVIEW_INSTRUCTIONS = """
+    Only flag lines marked with "+" (introduced by this change) and cite their line numbers.
     
     Please provide:
     1. Code quality assessment (1-10 scale)
@@ -25,29 +69,88 @@ def analyze_code_quality(file_content: str, filename: str, patch: str) -> Dict[s
     4. Performance considerations
     5. Best practices violations
     6. Suggested improvements
+"""
+
+
+def _complete(prompt: str, max_tokens: int, model: str = CODE_REVIEW_MODEL) -> Any:
+    """One chat completion, paced by the shared rate-limit scheduler"""
+    check_abandoned()
+    with time_stage("llm_call"):
+        try:
+            raw = scheduler.call(
+                "openai",
+                get_openai_client().chat.completions.with_raw_response.create,
+                model=model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.3,
+                timeout=ANALYSIS_CALL_TIMEOUT
+            )
+        except Exception:
+            LLM_REQUESTS.inc(outcome="error")
+            raise
+    LLM_REQUESTS.inc(outcome="ok")
+    scheduler.observe("openai", raw.headers)
+    response = raw.parse()
+    record_usage(response.usage)
+    return response
+
+
+@tool(name="CodeAnalysisTool", cost=0.10)
+def analyze_code_quality(file_content: str, filename: str, patch: str,
+                         model: str = CODE_REVIEW_MODEL,
+                         static_findings: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Analyze code quality and provide suggestions
+    
+    `static_findings` from the local static analysis are given to the model as context.
+    """
+    
+    cache = get_analysis_cache()
+    cache_key = make_cache_key(model, PROMPT_VERSION, filename, patch, static_findings)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "tokens_used": 0, "cached": True}
+    
+    if count_tokens(patch) > LARGE_PATCH_TOKENS:
+        return _map_reduce_analysis(filename, patch, cache, cache_key, model, static_findings)
+    
+    return _request_analysis(filename, patch, cache, cache_key, model, static_findings)
+
 
+def _request_analysis(filename: str, patch: str, cache: Optional[AnalysisCache], cache_key: str,
+                      model: str = CODE_REVIEW_MODEL,
+                      static_findings: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Single-file model call; successful analyses are stored under `cache_key`"""
+    
+    prompt = f"""
+    Please analyze the following code changes and provide feedback:
+
+    File: {filename}
+    
+    Code Changes (Patch, prefixed with new-file line numbers):
+    {format_numbered_patch(patch)}
+    {format_findings(static_findings)}{REVIEW_INSTRUCTIONS}
     Format your response as a structured analysis.
     """
     
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a senior software engineer reviewing code. Provide constructive, detailed feedback."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.3
-        )
+        response = _complete(prompt, ANALYSIS_MAX_TOKENS, model)
         
         analysis = response.choices[0].message.content
         
-        return {
+        result = {
             "filename": filename,
             "analysis": analysis,
-            "model_used": "gpt-4",
+            "model_used": model,
             "tokens_used": response.usage.total_tokens if response.usage else 0
         }
+        if cache is not None:
+            cache.set(cache_key, result)
+        return result
     except Exception as e:
         return {
             "filename": filename,
@@ -56,28 +159,244 @@ def analyze_code_quality(file_content: str, filename: str, patch: str) -> Dict[s
         }
 
 
-@tool(name="SecurityScanTool", cost=0.05)
-def scan_for_security_issues(file_content: str, filename: str) -> Dict[str, Any]:
-    """Scan code for potential security vulnerabilities"""
-    
-    security_checks = {
-        "sql_injection": ["SELECT", "INSERT", "UPDATE", "DELETE", "DROP", "CREATE"],
-        "hardcoded_secrets": ["password", "api_key", "secret", "token", "credential"],
-        "unsafe_functions": ["eval(", "exec(", "subprocess.call", "os.system"],
-        "xss_vulnerable": ["innerHTML", "dangerouslySetInnerHTML", "document.write"],
+def _map_reduce_analysis(filename: str, patch: str, cache: Optional[AnalysisCache], cache_key: str,
+                         model: str = CODE_REVIEW_MODEL,
+                         static_findings: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Analyze an oversized patch chunk by chunk (split at hunk boundaries) and merge the verdicts"""
+    
+    chunks = chunk_patch(patch)
+    labelled = [(f"{filename} (part {number} of {len(chunks)})", chunk) for number, chunk in enumerate(chunks, start=1)]
+    engine = AnalysisEngine(max_in_flight=CHUNK_MAX_IN_FLIGHT)
+    parts = engine.map(
+        lambda item: _request_analysis(item[0], item[1], None, "", model),
+        labelled,
+        lambda item, error: {"filename": item[0], "analysis": f"Error analyzing file: {str(error)}", "error": True}
+    )
+    
+    succeeded = [part for part in parts if not part.get("error")]
+    if not succeeded:
+        return {
+            "filename": filename,
+            "analysis": f"Error analyzing file: all {len(chunks)} chunks failed",
+            "error": True
+        }
+    
+    tokens_used = sum(part.get("tokens_used", 0) for part in succeeded)
+    partial_analyses = "\n\n".join(f"--- {part['filename']} ---\n{part['analysis']}" for part in succeeded)
+    merge_prompt = f"""
+    The changes to {filename} were too large for one review and were analyzed in {len(chunks)} parts.
+    Merge these partial analyses into a single analysis of the whole file, removing duplicates
+    and giving one overall code quality assessment (1-10 scale):
+
+{partial_analyses}
+    {format_findings(static_findings)}"""
+    try:
+        response = _complete(merge_prompt, ANALYSIS_MAX_TOKENS, model)
+        analysis = response.choices[0].message.content
+        tokens_used += response.usage.total_tokens if response.usage else 0
+    except Exception:
+        # Keep the partial verdicts rather than losing the whole file
+        analysis = partial_analyses
+    
+    result = {
+        "filename": filename,
+        "analysis": analysis,
+        "model_used": model,
+        "tokens_used": tokens_used,
+        "chunks": len(chunks),
+        "failed_chunks": len(chunks) - len(succeeded)
     }
+    if cache is not None and not result["failed_chunks"]:
+        cache.set(cache_key, result)
+    return result
+
+
+@tool(name="BatchCodeAnalysisTool", cost=0.10)
+def analyze_code_quality_batch(files: List[Dict[str, Any]], model: str = CODE_REVIEW_MODEL) -> List[Dict[str, Any]]:
+    """Analyze several small patches in one request and split the answer per file
+    
+    Files already in the analysis cache are served from it; any file missing
+    from the model's response falls back to a request of its own.
+    """
+    
+    cache = get_analysis_cache()
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for file_data in files:
+        cache_key = make_cache_key(model, PROMPT_VERSION, file_data["filename"], file_data["patch"],
+                                   file_data.get("static_findings"))
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached is not None:
+            results[file_data["filename"]] = {**cached, "tokens_used": 0, "cached": True}
+        else:
+            pending.append((file_data, cache_key))
+    
+    if len(pending) == 1:
+        file_data, cache_key = pending[0]
+        results[file_data["filename"]] = _request_analysis(
+            file_data["filename"], file_data["patch"], cache, cache_key, model, file_data.get("static_findings")
+        )
+    elif pending:
+        sections = "\n\n".join(
+            build_batch_section(
+                file_data["filename"],
+                format_numbered_patch(file_data["patch"]) + format_findings(file_data.get("static_findings"))
+            )
+            for file_data, _ in pending
+        )
+        prompt = f"""
+    Please analyze the following code changes to {len(pending)} files and provide feedback for each file.
+
+    Code Changes (one patch per file, prefixed with new-file line numbers):
+{sections}
+    {REVIEW_INSTRUCTIONS}
+    Answer for every file, in the same order. Start each file's analysis with a line
+    containing exactly "{FILE_MARKER}" (with the real filename) and nothing else.
+    """
+        
+        try:
+            response = _complete(prompt, BATCH_RESPONSE_TOKENS_PER_FILE * len(pending), model)
+            answers = split_batch_response(response.choices[0].message.content or "")
+            tokens_each = (response.usage.total_tokens if response.usage else 0) // len(pending)
+        except Exception:
+            answers, tokens_each = {}, 0
+        
+        for file_data, cache_key in pending:
+            filename = file_data["filename"]
+            if answers.get(filename):
+                result = {
+                    "filename": filename,
+                    "analysis": answers[filename],
+                    "model_used": model,
+                    "tokens_used": tokens_each,
+                    "batch_size": len(pending)
+                }
+                if cache is not None:
+                    cache.set(cache_key, result)
+                results[filename] = result
+            else:
+                results[filename] = _request_analysis(
+                    filename, file_data["patch"], cache, cache_key, model, file_data.get("static_findings")
+                )
+    
+    return [results[file_data["filename"]] for file_data in files]
+
+
+def _tier_calls(files: List[Dict[str, Any]]) -> int:
+    """Most sequential model calls one tier makes for a planned batch
+    
+    A batch request can fall back to one request per file; an oversized patch
+    takes one round per CHUNK_MAX_IN_FLIGHT chunks plus the merge.
+    """
+    if len(files) > 1:
+        return 1 + len(files)
+    if count_tokens(files[0]["patch"]) > LARGE_PATCH_TOKENS:
+        return math.ceil(len(chunk_patch(files[0]["patch"])) / max(1, CHUNK_MAX_IN_FLIGHT)) + 1
+    return 1
+
+
+def expected_calls(files: List[Dict[str, Any]]) -> int:
+    """Most sequential model calls `analyze_with_cascade` makes for a batch; sizes its engine timeout"""
+    return _tier_calls(files) * (2 if CASCADE_MODE == "model" else 1)
+
+
+def _run_tier(files: List[Dict[str, Any]], model: str) -> Tuple[List[Dict[str, Any]], float]:
+    """Analyze files with one model, batched as planned; returns the analyses and the call's latency"""
+    started = time.perf_counter()
+    if len(files) == 1:
+        analyses = [analyze_code_quality(files[0].get("content", ""), files[0]["filename"], files[0]["patch"],
+                                         model=model, static_findings=files[0].get("static_findings"))]
+    else:
+        analyses = analyze_code_quality_batch(files, model=model)
+    return analyses, time.perf_counter() - started
+
+
+def analyze_with_cascade(files: List[Dict[str, Any]], security_issues: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Code quality analysis of one planned batch through the tiered model cascade
+    
+    Files are first scored locally; security findings or high complexity send
+    a file straight to the review model. The rest get the cheap tier (the fast
+    model, or the local scorer alone in "heuristic" mode), and fast-model
+    answers with a low or missing quality score are escalated. Each analysis
+    records its `cascade` tier, escalation reasons and latency.
+    """
+    if CASCADE_MODE == "off":
+        analyses, latency = _run_tier(files, CODE_REVIEW_MODEL)
+        return [_with_tier(analysis, LARGE, latency, []) for analysis in analyses]
     
-    issues = []
-    content_lower = file_content.lower()
+    risks = [assess_risk(file_data["patch"]) for file_data in files]
+    reasons = [risk_reasons(risk, issues, file_data.get("static_findings", []))
+               for risk, issues, file_data in zip(risks, security_issues, files)]
+    attempts: List[List[Dict[str, Any]]] = [[] for _ in files]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(files)
     
-    for issue_type, patterns in security_checks.items():
-        for pattern in patterns:
-            if pattern.lower() in content_lower:
-                issues.append({
-                    "type": issue_type,
-                    "pattern": pattern,
-                    "severity": "high" if issue_type in ["sql_injection", "unsafe_functions"] else "medium"
+    cheap = [index for index, file_reasons in enumerate(reasons) if not file_reasons]
+    if CASCADE_MODE == HEURISTIC:
+        for index in cheap:
+            results[index] = _with_tier(heuristic_analysis(files[index]["filename"], risks[index]), HEURISTIC, 0.0, [], risks[index])
+    elif cheap:
+        analyses, latency = _run_tier([files[index] for index in cheap], CASCADE_FAST_MODEL)
+        for index, analysis in zip(cheap, analyses):
+            reasons[index] = score_reasons(analysis)
+            if reasons[index]:
+                attempts[index].append({
+                    "tier": FAST,
+                    "model": CASCADE_FAST_MODEL,
+                    "latency_seconds": round(latency, 4),
+                    "score": parse_quality_score(analysis.get("analysis", "")),
+                    "tokens_used": analysis.get("tokens_used", 0),
                 })
+            else:
+                results[index] = _with_tier(analysis, FAST, latency, [], risks[index])
+    
+    escalated = [index for index, result in enumerate(results) if result is None]
+    if escalated:
+        analyses, latency = _run_tier([files[index] for index in escalated], CODE_REVIEW_MODEL)
+        for index, analysis in zip(escalated, analyses):
+            for reason in reasons[index]:
+                CASCADE_ESCALATIONS.inc(reason=reason)
+            # Tokens spent on the abandoned fast answer still count towards the file's cost
+            spent = sum(attempt["tokens_used"] for attempt in attempts[index])
+            analysis = {**analysis, "tokens_used": analysis.get("tokens_used", 0) + spent}
+            results[index] = _with_tier(analysis, LARGE, latency, reasons[index], risks[index], attempts[index])
+    return results
+
+
+def _with_tier(analysis: Dict[str, Any], tier: str, latency: float, reasons: List[str],
+               risk: Optional[Dict[str, int]] = None, attempts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Attach the cascade record: final tier, why it escalated and latency including earlier tiers"""
+    CASCADE_FILES.inc(tier=tier)
+    attempts = attempts or []
+    cascade = {
+        "tier": tier,
+        "model": analysis.get("model_used"),
+        "escalated": bool(reasons),
+        "reasons": reasons,
+        "latency_seconds": round(latency + sum(attempt["latency_seconds"] for attempt in attempts), 4),
+        "score": parse_quality_score(analysis.get("analysis", "")) if not analysis.get("error") else None,
+    }
+    if risk is not None:
+        cascade["risk"] = risk
+    if attempts:
+        cascade["attempts"] = attempts
+    return {**analysis, "cascade": cascade}
+
+
+@tool(name="SecurityScanTool", cost=0.05)
+def scan_for_security_issues(file_content: str, filename: str, patch: str = "") -> Dict[str, Any]:
+    """Scan code for potential security vulnerabilities
+    
+    When a patch is given only the lines it adds are scanned, streamed hunk by
+    hunk, and findings carry their new-file line numbers.
+    """
+    
+    with time_stage("security_scan"):
+        if patch:
+            findings = DEFAULT_SCANNER.scan_lines(iter_added_lines(patch))
+        else:
+            findings = DEFAULT_SCANNER.scan_lines(enumerate(file_content.splitlines(), start=1))
+        
+        issues = [{**finding, "filename": filename} for finding in findings]
     
     return {
         "filename": filename,
@@ -87,26 +406,52 @@ def scan_for_security_issues(file_content: str, filename: str) -> Dict[str, Any]
 
 
 @tool(name="TestCoverageTool", cost=0.03)
-def analyze_test_coverage(files_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze if PR includes appropriate tests"""
+def analyze_test_coverage(files_data: List[Dict[str, Any]], test_index: Optional[RepoTestIndex] = None) -> Dict[str, Any]:
+    """Analyze if PR includes appropriate tests
+    
+    Test files are recognized by per-language naming conventions. Each changed
+    source file is matched to tests changed in the PR and, given the base
+    branch's `test_index`, to existing tests in the repository it may leave stale.
+    """
     
     source_files = []
     test_files = []
     
     for file_data in files_data:
         filename = file_data["filename"]
-        if any(test_indicator in filename.lower() for test_indicator in ["test", "spec", "__tests__"]):
+        if is_test_path(filename):
             test_files.append(filename)
-        elif filename.endswith(('.py', '.js', '.ts', '.tsx', '.jsx')):
+        elif source_key(filename) is not None and not is_test_support_path(filename):
             source_files.append(filename)
     
     coverage_ratio = len(test_files) / len(source_files) if source_files else 0
+    assessment = "good" if coverage_ratio >= 0.5 else "needs_improvement" if coverage_ratio > 0 else "missing"
+    
+    changed_tests: Dict[Any, List[str]] = {}
+    for filename in test_files:
+        changed_tests.setdefault(test_key(filename), []).append(filename)
+    
+    test_mapping = {}
+    untested_sources = []
+    for filename in source_files:
+        updated = changed_tests.get(source_key(filename), [])
+        existing = [test for test in test_index.tests_for(filename) if test not in updated] if test_index else []
+        test_mapping[filename] = {"updated_tests": updated, "existing_tests": existing}
+        if not updated and not existing:
+            untested_sources.append(filename)
+    
+    # Tests exist for every changed module, they just weren't touched: weaker than no tests at all
+    if assessment == "missing" and test_index is not None and source_files and not untested_sources:
+        assessment = "needs_improvement"
     
     return {
         "source_files_count": len(source_files),
         "test_files_count": len(test_files),
         "coverage_ratio": coverage_ratio,
-        "coverage_assessment": "good" if coverage_ratio >= 0.5 else "needs_improvement" if coverage_ratio > 0 else "missing",
+        "coverage_assessment": assessment,
         "source_files": source_files,
-        "test_files": test_files
-    }
\ No newline at end of file
+        "test_files": test_files,
+        "test_mapping": test_mapping,
+        "untested_sources": untested_sources,
+        "test_index": test_index.stats() if test_index else None
+    }
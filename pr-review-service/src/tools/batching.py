@@ -0,0 +1,80 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+from config.settings import BATCH_TOKEN_BUDGET, BATCH_SMALL_PATCH_TOKENS, BATCH_MAX_FILES
+
+
+FILE_MARKER = "=== FILE: {filename} ==="
+_FILE_MARKER_PATTERN = re.compile(r"^=== FILE: (.+?) ===[ \t]*$", re.MULTILINE)
+# Per-file framing added around each patch inside a batched prompt
+_PER_FILE_OVERHEAD_TOKENS = 20
+
+
+@lru_cache(maxsize=1)
+def _tiktoken() -> Any:
+    """tiktoken, imported on the first count; None when it is not installed"""
+    try:
+        import tiktoken
+    except ImportError:  # Optional; fall back to a character-based estimate
+        return None
+    return tiktoken
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    tiktoken = _tiktoken()
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Token count of `text` for `model` (about four characters per token without tiktoken)"""
+    if _tiktoken() is None:
+        return len(text) // 4 + 1
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def plan_batches(patch_tokens: List[int], token_budget: int = BATCH_TOKEN_BUDGET,
+                 small_patch_tokens: int = BATCH_SMALL_PATCH_TOKENS,
+                 max_files: int = BATCH_MAX_FILES) -> List[List[int]]:
+    """Group file indexes into LLM requests.
+
+    Patches of at most `small_patch_tokens` are packed, in PR order, into
+    shared requests of up to `token_budget` patch tokens and `max_files`
+    files. Larger patches always get a request of their own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for index, tokens in enumerate(patch_tokens):
+        if tokens > small_patch_tokens or max_files <= 1:
+            batches.append([index])
+            continue
+        cost = tokens + _PER_FILE_OVERHEAD_TOKENS
+        if current and (current_tokens + cost > token_budget or len(current) >= max_files):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += cost
+
+    if current:
+        batches.append(current)
+    return sorted(batches, key=lambda batch: batch[0])
+
+
+def split_batch_response(text: str) -> Dict[str, str]:
+    """Map each filename to its section of a batched analysis response"""
+    sections: Dict[str, str] = {}
+    markers = list(_FILE_MARKER_PATTERN.finditer(text))
+    for position, marker in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        sections[marker.group(1).strip()] = text[marker.end():end].strip()
+    return sections
+
+
+def build_batch_section(filename: str, numbered_patch: str) -> str:
+    return f"{FILE_MARKER.format(filename=filename)}\n{numbered_patch}"
+
@@ -0,0 +1,133 @@
+import re
+from typing import Any, Dict, List, Optional
+from config.settings import (
+    CASCADE_MODE, CASCADE_FAST_MODEL, CASCADE_MIN_SCORE, CASCADE_MAX_COMPLEXITY, CASCADE_ESCALATE_SEVERITIES
+)
+from src.tools.diff_parser import iter_added_lines
+from src.tools.security_scanner import is_serious
+
+
+HEURISTIC = "heuristic"
+FAST = "fast"
+LARGE = "large"
+
+# Branch points counted on added lines, roughly cyclomatic complexity across common languages
+_DECISION_POINT = re.compile(
+    r"\b(?:if|elif|for|foreach|while|case|catch|except|when|unless)\b|&&|\|\||\band\b|\bor\b|\?\s*[^:?]+\s*:"
+)
+_SCORE = re.compile(r"(?i)(?:quality|score|rating)[^\d\n]{0,40}?(\d+(?:\.\d+)?)\s*(?:/|out of)\s*10\b")
+_ANY_SCORE = re.compile(r"\b(\d+(?:\.\d+)?)\s*/\s*10\b")
+
+# Indentation deeper than this many levels counts towards complexity
+_NESTING_ALLOWANCE = 3
+
+
+def cascade_fingerprint() -> str:
+    """Identifies the cascade configuration; part of the analysis version"""
+    if CASCADE_MODE == "off":
+        return "off"
+    fast = CASCADE_FAST_MODEL if CASCADE_MODE == "model" else HEURISTIC
+    return f"{CASCADE_MODE}-{fast}-{CASCADE_MIN_SCORE:g}-{CASCADE_MAX_COMPLEXITY}"
+
+
+def _indent_level(text: str) -> int:
+    expanded = text.expandtabs(4)
+    return (len(expanded) - len(expanded.lstrip(" "))) // 4
+
+
+def assess_risk(patch: str) -> Dict[str, int]:
+    """Local complexity estimate of the lines a patch adds
+
+    `complexity` is the number of branch points added plus one for every
+    indentation level beyond three; `max_nesting` is the deepest added line.
+    """
+    added_lines = decision_points = max_nesting = deep_lines = 0
+    for _, text in iter_added_lines(patch):
+        if not text.strip():
+            continue
+        added_lines += 1
+        decision_points += len(_DECISION_POINT.findall(text))
+        level = _indent_level(text)
+        max_nesting = max(max_nesting, level)
+        if level > _NESTING_ALLOWANCE:
+            deep_lines += 1
+    return {
+        "added_lines": added_lines,
+        "decision_points": decision_points,
+        "max_nesting": max_nesting,
+        "complexity": decision_points + max(0, max_nesting - _NESTING_ALLOWANCE) + deep_lines // 10,
+    }
+
+
+def parse_quality_score(analysis: str) -> Optional[float]:
+    """The 1-10 code quality score a model gave in its analysis, if it stated one"""
+    match = _SCORE.search(analysis or "") or _ANY_SCORE.search(analysis or "")
+    if match is None:
+        return None
+    score = float(match.group(1))
+    return score if 0 <= score <= 10 else None
+
+
+def risk_reasons(risk: Dict[str, int], security_issues: List[Dict[str, Any]],
+                 static_findings: List[Dict[str, Any]] = ()) -> List[str]:
+    """Reasons, known before any model call, to send a file straight to the large model"""
+    reasons = []
+    if any(is_serious(issue, CASCADE_ESCALATE_SEVERITIES) for issue in security_issues):
+        reasons.append("security")
+    if risk["complexity"] >= CASCADE_MAX_COMPLEXITY:
+        reasons.append("complexity")
+    if any(finding["severity"] == "error" or finding["rule"] == "complex_function" for finding in static_findings):
+        reasons.append("static_analysis")
+    return reasons
+
+
+def score_reasons(analysis: Dict[str, Any]) -> List[str]:
+    """Reasons to escalate a file after the fast model's answer"""
+    if analysis.get("error"):
+        return ["fast_model_error"]
+    score = parse_quality_score(analysis.get("analysis", ""))
+    if score is None:
+        return ["no_score"]
+    if score < CASCADE_MIN_SCORE:
+        return ["low_score"]
+    return []
+
+
+def heuristic_analysis(filename: str, risk: Dict[str, int]) -> Dict[str, Any]:
+    """Analysis for a file the local scorer judged low risk, in place of a model review"""
+    return {
+        "filename": filename,
+        "analysis": (
+            f"Low-risk change (heuristic pass, no model review): {risk['added_lines']} added lines, "
+            f"complexity {risk['complexity']}, max nesting {risk['max_nesting']}; below every escalation threshold."
+        ),
+        "model_used": None,
+        "tokens_used": 0,
+    }
+
+
+def summarize_cascade(file_analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-review totals of the cascade: files per tier, escalation reasons and latency"""
+    tiers: Dict[str, int] = {}
+    reasons: Dict[str, int] = {}
+    latencies = []
+    for analysis in file_analyses:
+        cascade = analysis.get("cascade")
+        if not cascade or analysis.get("reused"):
+            continue
+        tiers[cascade["tier"]] = tiers.get(cascade["tier"], 0) + 1
+        for reason in cascade["reasons"]:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        latencies.append(cascade["latency_seconds"])
+    latencies.sort()
+    return {
+        "mode": CASCADE_MODE,
+        "tiers": tiers,
+        "escalated": sum(1 for analysis in file_analyses
+                         if analysis.get("cascade", {}).get("escalated") and not analysis.get("reused")),
+        "escalation_reasons": reasons,
+        "latency_seconds": {
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0,
+        },
+    }
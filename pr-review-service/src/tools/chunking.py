@@ -0,0 +1,80 @@
+from typing import Iterator, List
+from config.settings import CHUNK_TOKENS
+from src.tools.batching import count_tokens
+from src.tools.diff_parser import DiffLine, Hunk, iter_hunks
+
+
+def summarize_patch(patch: str) -> str:
+    """Local size summary used instead of a model review for static-only files"""
+    hunks = additions = deletions = 0
+    for hunk in iter_hunks(patch):
+        hunks += 1
+        for line in hunk.lines:
+            if line.kind == "+":
+                additions += 1
+            elif line.kind == "-":
+                deletions += 1
+    return (
+        f"Summary only (no model review): +{additions} / -{deletions} lines "
+        f"across {hunks} hunks."
+    )
+
+
+def _render(lines: List[DiffLine], old_start: int, new_start: int, section: str = "") -> str:
+    old_count = sum(1 for line in lines if line.kind != "+")
+    new_count = sum(1 for line in lines if line.kind != "-")
+    header = f"@@ -{old_start},{old_count} +{new_start},{new_count} @@{section}"
+    return "\n".join([header] + [line.kind + line.text for line in lines])
+
+
+def _split_hunk(hunk: Hunk, max_tokens: int) -> Iterator[str]:
+    """Split a single hunk that is too large on its own into consecutive sub-hunks"""
+    section = hunk.header.split("@@", 2)[2] if hunk.header.count("@@") >= 2 else ""
+    old_position, new_position = hunk.old_start, hunk.new_start
+    current: List[DiffLine] = []
+    current_tokens = 0
+    start = (old_position, new_position)
+
+    for line in hunk.lines:
+        tokens = count_tokens(line.text) + 1
+        if current and current_tokens + tokens > max_tokens:
+            yield _render(current, *start, section)
+            current, current_tokens = [], 0
+            start = (old_position, new_position)
+        current.append(line)
+        current_tokens += tokens
+        if line.kind != "+":
+            old_position += 1
+        if line.kind != "-":
+            new_position += 1
+
+    if current:
+        yield _render(current, *start, section)
+
+
+def chunk_patch(patch: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split a patch into pieces of at most about `max_tokens`, at hunk boundaries where possible"""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for hunk in iter_hunks(patch):
+        text = "\n".join([hunk.header] + [line.kind + line.text for line in hunk.lines])
+        tokens = count_tokens(text)
+
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_hunk(hunk, max_tokens))
+            continue
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
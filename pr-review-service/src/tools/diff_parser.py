@@ -0,0 +1,114 @@
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffLine(NamedTuple):
+    """One body line of a hunk; `kind` is "+", "-" or " " """
+    kind: str
+    text: str
+    old_line: Optional[int]
+    new_line: Optional[int]
+
+
+class Hunk(NamedTuple):
+    header: str
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    lines: List[DiffLine]
+
+
+def _iter_text_lines(text: str) -> Iterator[str]:
+    """Lines of `text` without building a list of the whole patch"""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        yield text[start:end].rstrip("\r")
+        start = end + 1
+
+
+def _iter_diff_lines(patch: str) -> Iterator[Tuple[Optional[str], Optional[DiffLine]]]:
+    """Yield `(header, None)` at each hunk start and `(None, line)` for each body line.
+
+    Every body line starts with its "+", "-" or " " marker, so a line
+    beginning with "@@" is always a hunk header. Anything before the first
+    hunk (file headers) and "\\ No newline at end of file" markers are skipped.
+    """
+    old_line = new_line = 0
+    in_hunk = False
+
+    for raw in _iter_text_lines(patch):
+        match = _HUNK_HEADER.match(raw)
+        if match:
+            old_line = int(match.group(1))
+            new_line = int(match.group(3))
+            in_hunk = True
+            yield raw, None
+            continue
+        if not in_hunk:
+            continue
+
+        kind, text = (raw[:1] or " "), raw[1:]
+        if kind == "+":
+            yield None, DiffLine("+", text, None, new_line)
+            new_line += 1
+        elif kind == "-":
+            yield None, DiffLine("-", text, old_line, None)
+            old_line += 1
+        elif kind == "\\":
+            continue
+        else:
+            yield None, DiffLine(" ", text, old_line, new_line)
+            old_line += 1
+            new_line += 1
+
+
+def iter_hunks(patch: str) -> Iterator[Hunk]:
+    """Parse a unified diff (as found in GitHub's `patch` field) hunk by hunk"""
+    header = None
+    counts = (0, 0, 0, 0)
+    lines: List[DiffLine] = []
+
+    for hunk_header, line in _iter_diff_lines(patch):
+        if hunk_header is not None:
+            if header is not None:
+                yield Hunk(header, *counts, lines)
+            match = _HUNK_HEADER.match(hunk_header)
+            header = hunk_header
+            counts = (
+                int(match.group(1)), int(match.group(2) or 1),
+                int(match.group(3)), int(match.group(4) or 1),
+            )
+            lines = []
+        else:
+            lines.append(line)
+
+    if header is not None:
+        yield Hunk(header, *counts, lines)
+
+
+def iter_added_lines(patch: str) -> Iterator[Tuple[int, str]]:
+    """`(new_file_line_number, text)` for every line the patch introduces"""
+    for _, line in _iter_diff_lines(patch):
+        if line is not None and line.kind == "+":
+            yield line.new_line, line.text
+
+
+def format_numbered_patch(patch: str) -> str:
+    """Render a patch with new-file line numbers in front of added and context lines"""
+    rendered = []
+    for hunk_header, line in _iter_diff_lines(patch):
+        if hunk_header is not None:
+            rendered.append(hunk_header)
+        elif line.kind == "-":
+            rendered.append(f"{'':>6} -{line.text}")
+        else:
+            rendered.append(f"{line.new_line:>6} {line.kind}{line.text}")
+    return "\n".join(rendered)
@@ -0,0 +1,235 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.settings import GITHUB_POOL_SIZE, GITHUB_PER_PAGE, GITHUB_PULL_CACHE_TTL
+from src.core.rate_limiter import scheduler
+
+
+class _PullEntry:
+    """A cached pull request object and the API calls spent on it"""
+
+    __slots__ = ("pull", "fetched_at", "requests")
+
+    def __init__(self, pull: Any, requests: int):
+        self.pull = pull
+        self.fetched_at = time.monotonic()
+        self.requests = requests
+
+
+class GitHubClient:
+    """Long-lived GitHub client shared by every review using the same token.
+
+    A single PyGithub instance keeps its HTTP connection pool alive across
+    calls, repository objects are cached for the life of the client and pull
+    request objects for `pull_cache_ttl` seconds (or until `release_pull`),
+    so one review resolves the repo and pull at most once. Every REST call
+    issued through this client is counted in `request_count` and paced by the
+    shared rate-limit scheduler, which also owns retries (PyGithub's own
+    retry is disabled so backoff is decided in one place).
+    """
+
+    def __init__(self, github_token: str, pool_size: int = GITHUB_POOL_SIZE,
+                 per_page: int = GITHUB_PER_PAGE, pull_cache_ttl: float = GITHUB_PULL_CACHE_TTL,
+                 max_cached: int = 256, github: Any = None):
+        if github is None:
+            # Imported here so processes that never call GitHub don't pay for PyGithub
+            from github import Auth, Github
+            github = Github(auth=Auth.Token(github_token), per_page=per_page, pool_size=pool_size, retry=None)
+        # Otherwise a PyGithub-compatible substitute (benchmarks use a local fake)
+        self.github = github
+        self.per_page = per_page
+        self.pull_cache_ttl = pull_cache_ttl
+        self.max_cached = max_cached
+        self.request_count = 0
+        self._login: Optional[str] = None
+        self._login_checked = False
+
+        self._repos: "OrderedDict[str, Any]" = OrderedDict()
+        self._pulls: "OrderedDict[Tuple[str, int], _PullEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a PyGithub call through the scheduler and pause it when the quota runs out"""
+        try:
+            return scheduler.call("github", func, *args, **kwargs)
+        finally:
+            requester = getattr(self.github, "requester", None)
+            remaining, _ = getattr(requester, "rate_limiting", (-1, -1))
+            if remaining == 0:
+                scheduler.observe("github", {
+                    "x-ratelimit-remaining": "0",
+                    "x-ratelimit-reset": str(getattr(requester, "rate_limiting_resettime", 0)),
+                })
+
+    def count_requests(self, repo_name: str, pr_number: int, requests: int = 1):
+        """Record REST calls made on behalf of a pull request"""
+        with self._lock:
+            self.request_count += requests
+            entry = self._pulls.get((repo_name, pr_number))
+            if entry is not None:
+                entry.requests += requests
+
+    def get_repo(self, repo_name: str) -> Any:
+        return self._get_repo(repo_name)[0]
+
+    def _get_repo(self, repo_name: str) -> Tuple[Any, int]:
+        """Cached repository object and the number of REST calls spent fetching it"""
+        with self._lock:
+            repo = self._repos.get(repo_name)
+            if repo is not None:
+                self._repos.move_to_end(repo_name)
+                return repo, 0
+
+        repo = self.call(self.github.get_repo, repo_name)
+
+        with self._lock:
+            self.request_count += 1
+            self._repos[repo_name] = repo
+            while len(self._repos) > self.max_cached:
+                self._repos.popitem(last=False)
+        return repo, 1
+
+    def get_pull(self, repo_name: str, pr_number: int) -> Any:
+        key = (repo_name, pr_number)
+        with self._lock:
+            entry = self._pulls.get(key)
+            if entry is not None and time.monotonic() - entry.fetched_at < self.pull_cache_ttl:
+                self._pulls.move_to_end(key)
+                return entry.pull
+
+        repo, repo_requests = self._get_repo(repo_name)
+        pull = self.call(repo.get_pull, pr_number)
+
+        with self._lock:
+            self.request_count += 1
+            self._pulls[key] = _PullEntry(pull, requests=repo_requests + 1)
+            while len(self._pulls) > self.max_cached:
+                self._pulls.popitem(last=False)
+        return pull
+
+    def get_files(self, repo_name: str, pr_number: int) -> list:
+        """All changed files of a pull request, counting one request per page"""
+        pull = self.get_pull(repo_name, pr_number)
+        files = self.call(lambda: list(pull.get_files()))
+        self.count_requests(repo_name, pr_number, max(1, math.ceil(len(files) / self.per_page)))
+        return files
+
+    def get_login(self) -> Optional[str]:
+        """Login the token authenticates as, looked up once; None if the token cannot read its own user
+
+        GitHub App installation tokens cannot, and learn their `app[bot]`
+        login from the first comment they post (`remember_login`).
+        """
+        with self._lock:
+            if self._login is not None or self._login_checked:
+                return self._login
+        try:
+            login = self.call(lambda: self.github.get_user().login)
+        except Exception:
+            login = None
+        with self._lock:
+            self.request_count += 1
+            self._login_checked = True
+            self._login = self._login or login
+            return self._login
+
+    def remember_login(self, login: Optional[str]):
+        with self._lock:
+            if login and self._login is None:
+                self._login = login
+
+    def get_issue_comments(self, repo_name: str, pr_number: int) -> list:
+        """All conversation comments of a pull request, oldest first, counting one request per page"""
+        pull = self.get_pull(repo_name, pr_number)
+        comments = self.call(lambda: list(pull.get_issue_comments()))
+        self.count_requests(repo_name, pr_number, max(1, math.ceil(len(comments) / self.per_page)))
+        return comments
+
+    def list_open_pulls(self, repo_name: str, updated_since: Optional[datetime] = None) -> List[int]:
+        """Numbers of open pull requests, most recently updated first, optionally only those updated since a time"""
+        repo = self.get_repo(repo_name)
+
+        def fetch() -> Tuple[List[int], int]:
+            numbers: List[int] = []
+            seen = 0
+            for pull in repo.get_pulls(state="open", sort="updated", direction="desc"):
+                seen += 1
+                if updated_since is not None and pull.updated_at < updated_since:
+                    break
+                numbers.append(pull.number)
+            return numbers, seen
+
+        numbers, seen = self.call(fetch)
+        with self._lock:
+            self.request_count += max(1, math.ceil(seen / self.per_page))
+        return numbers
+
+    def get_tree_paths(self, repo_name: str, sha: str) -> Tuple[List[str], bool]:
+        """Every file path in the repository at `sha` from one recursive git-tree call, and whether GitHub truncated it"""
+        repo = self.get_repo(repo_name)
+        tree = self.call(repo.get_git_tree, sha, recursive=True)
+        with self._lock:
+            self.request_count += 1
+        paths = [element.path for element in tree.tree if element.type == "blob"]
+        return paths, bool((getattr(tree, "raw_data", None) or {}).get("truncated", False))
+
+    def compare_paths(self, repo_name: str, base: str, head: str) -> Optional[List[Tuple[str, str, Optional[str]]]]:
+        """(status, path, previous path) of files changed from `base` to `head`
+
+        None when `head` is not strictly ahead of `base` or GitHub's 300-file
+        limit may have cut the list short; the caller then re-reads the tree.
+        """
+        repo = self.get_repo(repo_name)
+
+        def fetch() -> Tuple[str, list]:
+            comparison = repo.compare(base, head)
+            return comparison.status, list(comparison.files)
+
+        status, files = self.call(fetch)
+        with self._lock:
+            self.request_count += 1
+        if status != "ahead" or len(files) >= 300:
+            return None
+        return [(file.status, file.filename, getattr(file, "previous_filename", None)) for file in files]
+
+    def pull_requests_used(self, repo_name: str, pr_number: int) -> int:
+        """REST calls made for this pull request since it was cached"""
+        with self._lock:
+            entry = self._pulls.get((repo_name, pr_number))
+            return entry.requests if entry is not None else 0
+
+    def release_pull(self, repo_name: str, pr_number: int):
+        """Drop the cached pull request object once its review is finished"""
+        with self._lock:
+            self._pulls.pop((repo_name, pr_number), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "request_count": self.request_count,
+                "cached_repos": len(self._repos),
+                "cached_pulls": len(self._pulls),
+            }
+
+
+_clients: Dict[str, GitHubClient] = {}
+_clients_lock = threading.Lock()
+
+
+def register_github_client(github_token: str, client: GitHubClient):
+    """Use `client` for every later `get_github_client(github_token)` call"""
+    with _clients_lock:
+        _clients[github_token] = client
+
+
+def get_github_client(github_token: str) -> GitHubClient:
+    """Shared client for a token, created on first use"""
+    with _clients_lock:
+        client = _clients.get(github_token)
+        if client is None:
+            client = GitHubClient(github_token)
+            _clients[github_token] = client
+        return client
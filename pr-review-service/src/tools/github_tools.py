@@ -1,45 +1,32 @@
-from typing import List, Dict, Any
-from github import Github
-from agentops.sdk.decorators import tool
-import requests
+from typing import List, Dict, Any, Optional
+from config.settings import COMMENT_UPSERT
+from src.core.metrics import COMMENT_PARTS
+from src.core.telemetry import tool
+from src.tools.github_client import get_github_client
+from src.tools.review_comment import content_hash, find_review_comments, mark, parse_marker
 
 
-@tool(name="GitHubFilesTool", cost=0.01)
-def get_pr_files(github_token: str, repo_name: str, pr_number: int) -> List[Dict[str, Any]]:
-    """Get list of files changed in a PR with their content"""
-    g = Github(github_token)
-    repo = g.get_repo(repo_name)
-    pr = repo.get_pull(pr_number)
-    
-    files_data = []
-    for file in pr.get_files():
-        file_data = {
-            "filename": file.filename,
-            "status": file.status,
-            "additions": file.additions,
-            "deletions": file.deletions,
-            "changes": file.changes,
-            "patch": file.patch if file.patch else "",
-            "raw_url": file.raw_url,
-        }
-        files_data.append(file_data)
-    
-    return files_data
+def _file_to_dict(file: Any) -> Dict[str, Any]:
+    return {
+        "filename": file.filename,
+        "status": file.status,
+        "additions": file.additions,
+        "deletions": file.deletions,
+        "changes": file.changes,
+        "patch": file.patch if file.patch else "",
+        "raw_url": file.raw_url,
+    }
 
 
-@tool(name="GitHubPRInfoTool", cost=0.01)
-def get_pr_info(github_token: str, repo_name: str, pr_number: int) -> Dict[str, Any]:
-    """Get PR information including title, description, and metadata"""
-    g = Github(github_token)
-    repo = g.get_repo(repo_name)
-    pr = repo.get_pull(pr_number)
-    
+def _pull_to_dict(pr: Any) -> Dict[str, Any]:
     return {
         "title": pr.title,
         "body": pr.body or "",
         "user": pr.user.login,
         "base_branch": pr.base.ref,
         "head_branch": pr.head.ref,
+        "base_sha": pr.base.sha,
+        "head_sha": pr.head.sha,
         "state": pr.state,
         "mergeable": pr.mergeable,
         "changed_files": pr.changed_files,
@@ -50,17 +37,99 @@ def get_pr_info(github_token: str, repo_name: str, pr_number: int) -> Dict[str,
     }
 
 
+@tool(name="GitHubPRDetailsTool", cost=0.01)
+def get_pr_details(github_token: str, repo_name: str, pr_number: int) -> Dict[str, Any]:
+    """Get PR metadata and changed files in one step from a single cached pull object"""
+    client = get_github_client(github_token)
+    pr = client.get_pull(repo_name, pr_number)
+    files = client.get_files(repo_name, pr_number)
+
+    return {
+        "pr_info": _pull_to_dict(pr),
+        "files": [_file_to_dict(file) for file in files],
+    }
+
+
+@tool(name="GitHubFilesTool", cost=0.01)
+def get_pr_files(github_token: str, repo_name: str, pr_number: int) -> List[Dict[str, Any]]:
+    """Get list of files changed in a PR with their content"""
+    client = get_github_client(github_token)
+    return [_file_to_dict(file) for file in client.get_files(repo_name, pr_number)]
+
+
+@tool(name="GitHubPRInfoTool", cost=0.01)
+def get_pr_info(github_token: str, repo_name: str, pr_number: int) -> Dict[str, Any]:
+    """Get PR information including title, description, and metadata"""
+    pr = get_github_client(github_token).get_pull(repo_name, pr_number)
+    return _pull_to_dict(pr)
+
+
+# Statuses of an edit or delete on a comment that is gone or no longer ours to change
+_GONE = (403, 404)
+
+
 @tool(name="GitHubCommentTool", cost=0.02)
-def post_pr_comment(github_token: str, repo_name: str, pr_number: int, comment: str) -> Dict[str, Any]:
-    """Post a review comment on a PR"""
-    g = Github(github_token)
-    repo = g.get_repo(repo_name)
-    pr = repo.get_pull(pr_number)
-    
-    comment_obj = pr.create_issue_comment(comment)
-    
+def post_pr_comment(github_token: str, repo_name: str, pr_number: int, comment: str,
+                    sections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Post a review comment on a PR, editing the service's earlier comment instead of adding another
+
+    `sections` are follow-up comments for a review too long for one comment.
+    Each part carries a hidden marker with its content hash, so a part whose
+    content hasn't changed since the last review is not written again, and
+    follow-ups left over from a longer earlier review are deleted. Only
+    comments written by the token's own user are ever edited or deleted;
+    when that login is unknown every part is posted as a new comment.
+    """
+    client = get_github_client(github_token)
+    pr = client.get_pull(repo_name, pr_number)
+    bodies = [comment] + list(sections or [])
+
+    existing: Dict[int, Any] = {}
+    stale: List[Any] = []
+    login = client.get_login() if COMMENT_UPSERT else None
+    if login:
+        existing, stale = find_review_comments(client.get_issue_comments(repo_name, pr_number), login)
+        stale += [previous for part, previous in existing.items() if part >= len(bodies)]
+
+    posted, actions = [], []
+    for part, body in enumerate(bodies):
+        previous = existing.get(part)
+        action = "created"
+        if previous is not None and parse_marker(previous.body)[1] == content_hash(body):
+            action = "unchanged"
+        elif previous is not None:
+            try:
+                client.call(previous.edit, mark(body, part))
+                action = "updated"
+            except Exception as e:
+                if getattr(e, "status", None) not in _GONE:
+                    raise
+                # Deleted or locked since it was listed; post it again below
+        if action == "created":
+            previous = client.call(pr.create_issue_comment, mark(body, part))
+            client.remember_login(getattr(previous.user, "login", None))
+        posted.append(previous)
+        actions.append(action)
+
+    for previous in stale:
+        try:
+            client.call(previous.delete)
+        except Exception as e:
+            if getattr(e, "status", None) not in _GONE:
+                raise
+        actions.append("deleted")
+
+    writes = sum(1 for action in actions if action != "unchanged")
+    if writes:
+        client.count_requests(repo_name, pr_number, writes)
+    for action in actions:
+        COMMENT_PARTS.inc(action=action)
+
     return {
-        "comment_id": comment_obj.id,
-        "comment_url": comment_obj.html_url,
-        "created_at": comment_obj.created_at.isoformat(),
-    }
\ No newline at end of file
+        "comment_id": posted[0].id,
+        "comment_url": posted[0].html_url,
+        "created_at": posted[0].created_at.isoformat(),
+        "action": actions[0],
+        "parts": len(bodies),
+        "writes": writes,
+    }
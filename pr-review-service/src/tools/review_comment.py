@@ -0,0 +1,88 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import COMMENT_MAX_CHARS
+
+
+# Hidden first line of every comment the service posts; `part` 0 is the top-level summary
+_MARKER = re.compile(r"^<!-- pr-review-service:review part=(\d+) hash=([0-9a-f]+) -->")
+# Characters kept free in each part for the marker line and the follow-up heading
+_RESERVE = 120
+_TRUNCATED = "\n\n_… truncated to fit GitHub's comment size limit_"
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def mark(body: str, part: int) -> str:
+    """`body` with the hidden marker that lets a later review find and compare it"""
+    return f"<!-- pr-review-service:review part={part} hash={content_hash(body)} -->\n{body}"
+
+
+def parse_marker(text: Optional[str]) -> Optional[Tuple[int, str]]:
+    """(part, content hash) of a comment the service posted, or None for anyone else's comment"""
+    match = _MARKER.match(text or "")
+    return (int(match.group(1)), match.group(2)) if match else None
+
+
+def find_review_comments(comments: List[Any], login: str) -> Tuple[Dict[int, Any], List[Any]]:
+    """The service's earlier comments by part, and duplicates of a part left by overlapping reviews
+
+    Only comments written by `login` count, so a marker pasted into anyone
+    else's comment is ignored. `comments` are oldest first, so the oldest
+    comment of each part keeps its place in the thread.
+    """
+    parts: Dict[int, Any] = {}
+    duplicates = []
+    for comment in comments:
+        if getattr(comment.user, "login", None) != login:
+            continue
+        marker = parse_marker(comment.body)
+        if marker is None:
+            continue
+        if marker[0] in parts:
+            duplicates.append(comment)
+        else:
+            parts[marker[0]] = comment
+    return parts, duplicates
+
+
+def fits_in_comment(body: str, limit: int = COMMENT_MAX_CHARS) -> bool:
+    return len(body) <= limit - _RESERVE
+
+
+def truncate(body: str, limit: int) -> str:
+    """`body` cut at a line boundary to at most `limit` characters, closing an open code fence or <details>"""
+    if len(body) <= limit:
+        return body
+    cut = body[:limit - len(_TRUNCATED) - len("\n```\n</details>")]
+    if "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    if cut.count("```") % 2:
+        cut += "\n```"
+    if cut.count("<details>") > cut.count("</details>"):
+        cut += "\n</details>"
+    return cut + _TRUNCATED
+
+
+def split_comment(summary: str, sections: List[str], limit: int = COMMENT_MAX_CHARS) -> List[str]:
+    """A top-level summary and follow-up comments packing `sections` in order, each within `limit`
+
+    A section too long for a comment of its own is truncated.
+    """
+    budget = limit - _RESERVE
+    groups: List[List[str]] = []
+    size = 0
+    for section in sections:
+        section = truncate(section, budget)
+        if not groups or size + len(section) + 2 > budget:
+            groups.append([])
+            size = 0
+        groups[-1].append(section)
+        size += len(section) + 2
+    follow_ups = [
+        f"### 📋 Per-file analysis ({index}/{len(groups)})\n\n" + "\n\n".join(group)
+        for index, group in enumerate(groups, start=1)
+    ]
+    return [truncate(summary, budget)] + follow_ups
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from config.settings import SECURITY_RULES_PATH
+
+
+BUNDLED_RULES_PATH = os.path.join(os.path.dirname(__file__), "security_rules.json")
+SEVERITIES = ("low", "medium", "high")
+CONFIDENCES = ("low", "high")
+
+
+def is_serious(issue: Dict[str, Any], severities: Iterable[str] = ("high",)) -> bool:
+    """Whether a finding is confident and severe enough to act on without a human look
+
+    The one test behind both escalating a file to the large model and
+    requesting changes, so the two cannot disagree about a finding.
+    """
+    return issue["severity"] in severities and issue.get("confidence", "high") == "high"
+
+
+def _trie_pattern(words: Dict[str, str]) -> str:
+    """Regex source matching any of `words`, factored into a prefix trie.
+
+    The regex engine then branches on one character at a time instead of
+    trying every word at every position, so adding literals does not make
+    scans proportionally slower. Longer words win over their prefixes.
+    Each word ends in an empty group named by `words[word]`, so
+    `match.lastgroup` tells which word matched.
+    """
+    trie: Dict[str, Any] = {}
+    for word, group in words.items():
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = group
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if "" in node:
+            # Tried last, so a longer word through this node is preferred
+            branches.append(f"(?P<{node['']}>)")
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+class SecurityScanner:
+    """Single-pass scanner for a compiled set of security rules.
+
+    Literal rules (the default) match case-insensitively anywhere in a line;
+    rules with `"regex": true` use their pattern as a regular expression.
+    Every match is reported with its 1-based line and column. A rule's
+    `confidence` ("high" unless set) says how often a match is a real issue;
+    broad keyword rules are marked "low".
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        # Identifies this rule set so results recorded under other rules are not reused
+        self.fingerprint = hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self._rules_by_group: Dict[str, Dict[str, Any]] = {}
+        literals: Dict[str, str] = {}
+        regex_groups = []
+
+        seen_ids = set()
+        for rule in rules:
+            if rule["id"] in seen_ids:
+                raise ValueError(f"Duplicate security rule id: {rule['id']}")
+            if rule["severity"] not in SEVERITIES:
+                raise ValueError(f"Invalid severity for rule {rule['id']}: {rule['severity']}")
+            if rule.get("confidence", "high") not in CONFIDENCES:
+                raise ValueError(f"Invalid confidence for rule {rule['id']}: {rule['confidence']}")
+            seen_ids.add(rule["id"])
+            group = f"r{len(self._rules_by_group)}"
+            self._rules_by_group[group] = rule
+            if rule.get("regex"):
+                regex_groups.append(group)
+                continue
+            literal = rule["pattern"].lower()
+            if literal in literals:
+                duplicate = self._rules_by_group[literals[literal]]
+                raise ValueError(f"Security rules {duplicate['id']} and {rule['id']} have the same pattern: {rule['pattern']}")
+            literals[literal] = group
+
+        alternatives = []
+        if literals:
+            alternatives.append(_trie_pattern(literals))
+        for group in regex_groups:
+            alternatives.append(f"(?P<{group}>{self._rules_by_group[group]['pattern']})")
+        self._pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "SecurityScanner":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["rules"])
+
+    def scan_lines(self, lines: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """Yield one finding per rule match in `(line_number, text)` pairs"""
+        if self._pattern is None:
+            return
+        for line_number, text in lines:
+            for match in self._pattern.finditer(text):
+                rule = self._rules_by_group[match.lastgroup]
+                yield {
+                    "type": rule["type"],
+                    "pattern": rule["pattern"],
+                    "severity": rule["severity"],
+                    "confidence": rule.get("confidence", "high"),
+                    "rule_id": rule["id"],
+                    "line": line_number,
+                    "column": match.start() + 1,
+                    "match": match.group(),
+                }
+
+    def scan_text(self, text: str) -> List[Dict[str, Any]]:
+        return list(self.scan_lines(enumerate(text.splitlines(), start=1)))
+
+
+# Compiled once at import; every scan reuses the same automaton
+DEFAULT_SCANNER = SecurityScanner.from_file(SECURITY_RULES_PATH or BUNDLED_RULES_PATH)
@@ -0,0 +1,324 @@
+import ast
+import multiprocessing
+import os
+import re
+import textwrap
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config.settings import (
+    STATIC_ANALYSIS_ENABLED, STATIC_ANALYSIS_WORKERS, STATIC_MAX_COMPLEXITY, STATIC_MAX_FUNCTION_LINES
+)
+from src.tools.diff_parser import iter_hunks
+
+
+# Bump when a check changes so analyses built on earlier findings are not reused
+STATIC_ANALYZER_VERSION = "1"
+
+
+def static_fingerprint() -> str:
+    """Identifies the checks and their thresholds; part of the analysis version"""
+    if not STATIC_ANALYSIS_ENABLED:
+        return "off"
+    return f"{STATIC_ANALYZER_VERSION}-{STATIC_MAX_COMPLEXITY}-{STATIC_MAX_FUNCTION_LINES}"
+
+PYTHON_EXTENSIONS = {".py", ".pyi"}
+JS_EXTENSIONS = {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"}
+
+# (new-file line number, text) of the lines a hunk leaves in the new file
+NewLines = List[Tuple[int, str]]
+
+
+def _finding(rule: str, severity: str, line: Optional[int], message: str) -> Dict[str, Any]:
+    return {"rule": rule, "severity": severity, "line": line, "message": message}
+
+
+def _new_side(patch: str) -> List[Tuple[NewLines, Set[int]]]:
+    """Per hunk: its new-file lines (context and added) and the numbers of the added ones"""
+    hunks = []
+    for hunk in iter_hunks(patch):
+        lines = [(line.new_line, line.text) for line in hunk.lines if line.kind != "-"]
+        added = {line.new_line for line in hunk.lines if line.kind == "+"}
+        if added:
+            hunks.append((lines, added))
+    return hunks
+
+
+# --- Python: full `ast` checks where the code parses -------------------------------------------
+
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert)
+_BARE_EXCEPT = re.compile(r"^\s*except\s*:")
+
+
+def _complexity(function: ast.AST) -> int:
+    """McCabe-style complexity: one plus every branch and boolean operand in the function"""
+    score = 1
+    for node in ast.walk(function):
+        if isinstance(node, _BRANCHES):
+            score += 1
+        elif isinstance(node, ast.BoolOp):
+            score += len(node.values) - 1
+        elif isinstance(node, ast.comprehension):
+            score += 1 + len(node.ifs)
+    return score
+
+
+def _unused_imports(tree: ast.Module) -> List[Tuple[int, str]]:
+    imported: Dict[str, int] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported[alias.asname or alias.name.split(".")[0]] = node.lineno
+        elif isinstance(node, ast.ImportFrom) and node.module != "__future__":
+            for alias in node.names:
+                if alias.name != "*":
+                    imported[alias.asname or alias.name] = node.lineno
+
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    for node in ast.walk(tree):
+        # Names re-exported through __all__ count as used
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets):
+            used.update(element.value for element in ast.walk(node.value)
+                        if isinstance(element, ast.Constant) and isinstance(element.value, str))
+    return sorted((line, name) for name, line in imported.items() if name not in used)
+
+
+def _python_findings(filename: str, lines: NewLines, added: Set[int], whole_file: bool) -> List[Dict[str, Any]]:
+    numbers = [number for number, _ in lines]
+    source = "\n".join(text for _, text in lines)
+    if not whole_file:
+        # A hunk from inside a class or function is indented; snippets that still don't parse get line checks
+        source = textwrap.dedent(source)
+
+    def real_line(lineno: Optional[int]) -> Optional[int]:
+        return numbers[lineno - 1] if lineno and 0 < lineno <= len(numbers) else None
+
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        if whole_file:
+            return [_finding("syntax_error", "error", real_line(e.lineno), f"Syntax error: {e.msg}")]
+        return [
+            _finding("bare_except", "warning", number, "Bare `except:` also catches KeyboardInterrupt and SystemExit")
+            for number, text in lines if number in added and _BARE_EXCEPT.match(text)
+        ]
+
+    findings = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler) and node.type is None and real_line(node.lineno) in added:
+            findings.append(_finding("bare_except", "warning", real_line(node.lineno),
+                                     "Bare `except:` also catches KeyboardInterrupt and SystemExit"))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            span = {real_line(lineno) for lineno in range(node.lineno, (node.end_lineno or node.lineno) + 1)}
+            if not span & added:
+                continue
+            complexity = _complexity(node)
+            if complexity > STATIC_MAX_COMPLEXITY:
+                findings.append(_finding("complex_function", "warning", real_line(node.lineno),
+                                         f"`{node.name}` has cyclomatic complexity {complexity} (limit {STATIC_MAX_COMPLEXITY})"))
+            length = len(span)
+            if length > STATIC_MAX_FUNCTION_LINES:
+                findings.append(_finding("long_function", "info", real_line(node.lineno),
+                                         f"`{node.name}` is {length} lines long (limit {STATIC_MAX_FUNCTION_LINES})"))
+
+    # Only a whole new file shows every use of a name
+    if whole_file and not filename.endswith("__init__.py"):
+        for lineno, name in _unused_imports(tree):
+            if real_line(lineno) in added:
+                findings.append(_finding("unused_import", "warning", real_line(lineno), f"`{name}` is imported but never used"))
+    return findings
+
+
+# --- JS/TS: tokenizer-level pass over code with strings and comments blanked -------------------
+
+_JS_LINE_RULES = [
+    (re.compile(r"\bdebugger\b"), "debugger", "warning", "`debugger` statement left in"),
+    (re.compile(r"\bconsole\.(?:log|debug|trace)\s*\("), "console_log", "info", "Console logging left in"),
+    (re.compile(r"(?<![=!<>])==(?!=)|!=(?!=)"), "loose_equality", "warning", "Loose equality; use `===` / `!==`"),
+    (re.compile(r"\bvar\s"), "var_declaration", "info", "`var` declaration; prefer `let` or `const`"),
+    (re.compile(r"\bcatch\s*(?:\([^)]*\))?\s*\{\s*\}"), "empty_catch", "warning", "Empty `catch` block swallows errors"),
+]
+_TS_ANY = re.compile(r"(?::|\bas)\s*any\b")
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+
+
+def _blank_js(text: str, state: Dict[str, Any]) -> str:
+    """Code of one line with string contents and comments replaced by spaces
+
+    `state` carries an open block comment or template literal across lines.
+    Regex literals are not recognized; this is a tokenizer-level pass, not a parser.
+    """
+    out = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if state.get("comment"):
+            if text.startswith("*/", index):
+                state["comment"] = False
+                out.append("  ")
+                index += 2
+                continue
+            out.append(" ")
+        elif state.get("quote"):
+            if char == "\\":
+                out.append("  ")
+                index += 2
+                continue
+            if char == state["quote"]:
+                state["quote"] = None
+                out.append(char)
+            else:
+                out.append(" ")
+        elif text.startswith("//", index):
+            break
+        elif text.startswith("/*", index):
+            state["comment"] = True
+            out.append("  ")
+            index += 2
+            continue
+        elif char in "'\"`":
+            state["quote"] = char
+            out.append(char)
+        else:
+            out.append(char)
+        index += 1
+    # Only template literals span lines
+    if state.get("quote") in ("'", '"'):
+        state["quote"] = None
+    return "".join(out)
+
+
+def _js_findings(filename: str, lines: NewLines, added: Set[int], whole_file: bool) -> List[Dict[str, Any]]:
+    typescript = os.path.splitext(filename)[1].lower() in (".ts", ".tsx")
+    state: Dict[str, Any] = {}
+    findings = []
+    stack: List[Tuple[str, int]] = []
+    unbalanced = None
+
+    for number, text in lines:
+        code = _blank_js(text, state)
+        if number in added:
+            for pattern, rule, severity, message in _JS_LINE_RULES:
+                if pattern.search(code):
+                    findings.append(_finding(rule, severity, number, message))
+            if typescript and _TS_ANY.search(code):
+                findings.append(_finding("explicit_any", "info", number, "Explicit `any` disables type checking"))
+        if whole_file and unbalanced is None:
+            for char in code:
+                if char in "([{":
+                    stack.append((char, number))
+                elif char in _CLOSERS:
+                    if not stack or stack[-1][0] != _CLOSERS[char]:
+                        unbalanced = _finding("syntax_error", "error", number, f"Unmatched `{char}`")
+                        break
+                    stack.pop()
+
+    if whole_file:
+        if unbalanced is None and stack:
+            unbalanced = _finding("syntax_error", "error", stack[-1][1], f"`{stack[-1][0]}` is never closed")
+        if unbalanced is None and (state.get("comment") or state.get("quote")):
+            unbalanced = _finding("syntax_error", "error", lines[-1][0] if lines else None,
+                                  "Unterminated comment or template literal")
+        if unbalanced is not None:
+            findings.insert(0, unbalanced)
+    return findings
+
+
+def analyze_file_static(filename: str, status: str, patch: str) -> List[Dict[str, Any]]:
+    """Deterministic findings on the lines a patch adds, sorted by line
+
+    A new file's patch holds the whole file, so it also gets syntax and unused
+    import checks; other patches are checked hunk by hunk. Runs in worker
+    processes, so it only takes and returns plain data.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in PYTHON_EXTENSIONS:
+        check = _python_findings
+    elif extension in JS_EXTENSIONS:
+        check = _js_findings
+    else:
+        return []
+
+    try:
+        hunks = _new_side(patch)
+        whole_file = status == "added" and len(hunks) == 1
+        findings = []
+        for lines, added in hunks:
+            findings.extend(check(filename, lines, added, whole_file))
+    except Exception:
+        return []  # A checker bug must never fail the review
+    return sorted(findings, key=lambda finding: (finding["line"] or 0, finding["rule"]))
+
+
+def _analyze_job(job: Tuple[str, str, str]) -> List[Dict[str, Any]]:
+    return analyze_file_static(*job)
+
+
+def is_supported(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in PYTHON_EXTENSIONS | JS_EXTENSIONS
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by every review, started on first use; None runs checks in the calling thread"""
+    global _pool
+    if STATIC_ANALYSIS_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the service is multi-threaded when reviews run. Spawned
+            # processes re-import the main module, so the API is served from `python -m src` or uvicorn
+            _pool = ProcessPoolExecutor(max_workers=STATIC_ANALYSIS_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_static_pool():
+    """Stop the worker processes (called when the API shuts down)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_static_analysis(files: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Static findings for each file, analyzed across the process pool"""
+    results: List[List[Dict[str, Any]]] = [[] for _ in files]
+    indexes = [index for index, file_data in enumerate(files) if file_data.get("patch") and is_supported(file_data["filename"])]
+    jobs = [(files[index]["filename"], files[index].get("status", "modified"), files[index]["patch"]) for index in indexes]
+    if not jobs:
+        return results
+
+    pool = _get_pool() if len(jobs) > 1 else None
+    if pool is None:
+        findings = [_analyze_job(job) for job in jobs]
+    else:
+        try:
+            findings = list(pool.map(_analyze_job, jobs, chunksize=max(1, len(jobs) // (STATIC_ANALYSIS_WORKERS * 4))))
+        except (BrokenProcessPool, OSError):
+            shutdown_static_pool()
+            findings = [_analyze_job(job) for job in jobs]
+
+    for index, file_findings in zip(indexes, findings):
+        results[index] = file_findings
+    return results
+
+
+def format_findings(findings: List[Dict[str, Any]]) -> str:
+    """Findings as prompt context for the model; empty when there are none"""
+    if not findings:
+        return ""
+    lines = "\n".join(
+        f"    - line {finding['line']}: [{finding['rule']}] {finding['message']}" if finding["line"]
+        else f"    - [{finding['rule']}] {finding['message']}"
+        for finding in findings
+    )
+    return (
+        "\n    Local static analysis already reported (confirm or dismiss these briefly, "
+        "and focus on what it cannot see):\n" + lines + "\n"
+    )
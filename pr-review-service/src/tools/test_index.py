@@ -0,0 +1,217 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.settings import TEST_INDEX_CACHE_SIZE
+from src.tools.github_client import get_github_client
+
+
+# Extension -> language family; a test and its subject must share a family
+LANGUAGE_FAMILIES = {
+    ".py": "python",
+    ".js": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".mjs": "js", ".cjs": "js", ".vue": "js", ".svelte": "js",
+    ".go": "go",
+    ".java": "jvm", ".kt": "jvm", ".scala": "jvm",
+    ".cs": "dotnet",
+    ".php": "php",
+    ".rb": "ruby",
+    ".swift": "swift",
+    ".c": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".h": "c", ".hpp": "c",
+    ".rs": "rust",
+}
+
+# Test file naming conventions per family; group "subject" is the stem of the file under test
+_TEST_NAMES = {
+    "python": [r"test_(?P<subject>.+)", r"(?P<subject>.+?)_tests?"],
+    "js": [r"(?P<subject>.+?)\.(?:test|spec|stories|story|e2e)"],
+    "go": [r"(?P<subject>.+)_test"],
+    "jvm": [r"(?P<subject>.+?)(?:Tests?|IT|Spec|Suite)", r"Test(?P<subject>[A-Z].*)"],
+    "dotnet": [r"(?P<subject>.+?)Tests?"],
+    "php": [r"(?P<subject>.+?)Test"],
+    "ruby": [r"(?P<subject>.+?)_(?:spec|test)", r"test_(?P<subject>.+)"],
+    "swift": [r"(?P<subject>.+?)Tests?"],
+    "c": [r"test_(?P<subject>.+)", r"(?P<subject>.+?)_(?:unit)?tests?"],
+    "rust": [r"(?P<subject>.+)_tests?"],
+}
+_TEST_PATTERNS = {
+    family: [re.compile(f"^{pattern}$") for pattern in patterns] for family, patterns in _TEST_NAMES.items()
+}
+
+# Directories holding tests and their support code
+TEST_DIRECTORIES = {"test", "tests", "__tests__", "spec", "specs", "testing"}
+# Jest runs every file under `__tests__`, so a `__tests__/Button.tsx` tests Button whatever its name
+_JS_TEST_DIRECTORY = "__tests__"
+# Modules beside the tests that test nothing themselves (compared lowercased)
+_SUPPORT_STEMS = {
+    "__init__", "__main__", "conftest", "setup", "setuptests", "helper", "helpers", "util", "utils",
+    "fixtures", "factories", "mocks", "testutils", "test_utils", "test_helpers", "testhelpers",
+}
+# Layout directories that say nothing about which module a test belongs to
+_GENERIC_DIRECTORIES = TEST_DIRECTORIES | {"src", "lib", "app", "main", "java", "kotlin", "scala", "pkg", "internal"}
+
+TestKey = Tuple[str, str]
+
+
+def _split(path: str) -> Tuple[List[str], str, str]:
+    """Directory parts, stem and extension of a path"""
+    directory, filename = os.path.split(path)
+    stem, extension = os.path.splitext(filename)
+    return [part for part in directory.split("/") if part], stem, extension.lower()
+
+
+def test_key(path: str) -> Optional[TestKey]:
+    """(language family, subject) of a test file by naming convention, or None when `path` is not a test"""
+    parts, stem, extension = _split(path)
+    family = LANGUAGE_FAMILIES.get(extension)
+    if family is None or stem.lower() in _SUPPORT_STEMS:
+        return None
+    for pattern in _TEST_PATTERNS[family]:
+        match = pattern.match(stem)
+        if match:
+            return family, match.group("subject").lower()
+    if family == "js" and _JS_TEST_DIRECTORY in parts:
+        return family, stem.lower()
+    return None
+
+
+def source_key(path: str) -> Optional[TestKey]:
+    """(language family, subject) under which tests of a source file are indexed"""
+    _, stem, extension = _split(path)
+    family = LANGUAGE_FAMILIES.get(extension)
+    return (family, stem.lower()) if family is not None else None
+
+
+def is_test_path(path: str) -> bool:
+    return test_key(path) is not None
+
+
+def is_test_support_path(path: str) -> bool:
+    """A non-test file that belongs to the test suite: `conftest.py`, `tests/__init__.py`, `tests/helpers.py`, ..."""
+    if is_test_path(path):
+        return False
+    parts, stem, _ = _split(path)
+    return stem.lower() in ("conftest", "setuptests") or any(part.lower() in TEST_DIRECTORIES for part in parts)
+
+
+def _proximity(source_path: str, test_path: str) -> int:
+    """Meaningful directory names a test shares with its source (mirrored `src/a/b` and `tests/a/b` share two)"""
+    source_parts = {part.lower() for part in _split(source_path)[0]} - _GENERIC_DIRECTORIES
+    test_parts = {part.lower() for part in _split(test_path)[0]} - _GENERIC_DIRECTORIES
+    return len(source_parts & test_parts)
+
+
+class RepoTestIndex:
+    """Test files of one repository tree, keyed for constant-time lookup by the source they cover"""
+
+    def __init__(self, repo_name: str, sha: str, paths: Iterable[str] = (), truncated: bool = False):
+        self.repo_name = repo_name
+        self.sha = sha
+        self.truncated = truncated
+        self.file_count = 0
+        self._tests: Dict[TestKey, List[str]] = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str):
+        self.file_count += 1
+        key = test_key(path)
+        if key is not None:
+            self._tests.setdefault(key, []).append(path)
+
+    def remove(self, path: str):
+        self.file_count -= 1
+        key = test_key(path)
+        if key is not None and path in self._tests.get(key, ()):
+            self._tests[key].remove(path)
+            if not self._tests[key]:
+                del self._tests[key]
+
+    def updated(self, sha: str, changes: List[Tuple[str, str, Optional[str]]]) -> "RepoTestIndex":
+        """Copy of this index moved to `sha` by applying (status, path, previous path) changes"""
+        index = RepoTestIndex(self.repo_name, sha, truncated=self.truncated)
+        index.file_count = self.file_count
+        index._tests = {key: list(paths) for key, paths in self._tests.items()}
+        for status, path, previous in changes:
+            if status == "removed":
+                index.remove(path)
+            elif status == "renamed":
+                if previous:
+                    index.remove(previous)
+                index.add(path)
+            elif status in ("added", "copied"):
+                index.add(path)
+        return index
+
+    def tests_for(self, source_path: str) -> List[str]:
+        """Likely tests of a source file, closest directory first"""
+        key = source_key(source_path)
+        if key is None:
+            return []
+        candidates = self._tests.get(key, [])
+        return sorted(candidates, key=lambda test_path: (-_proximity(source_path, test_path), test_path))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "sha": self.sha,
+            "files": self.file_count,
+            "test_files": sum(len(paths) for paths in self._tests.values()),
+            "truncated": self.truncated,
+        }
+
+
+_indexes: "OrderedDict[Tuple[str, str], RepoTestIndex]" = OrderedDict()
+# Most recent index per repo, the starting point of the next incremental update
+_latest: "OrderedDict[str, RepoTestIndex]" = OrderedDict()
+_repo_locks: Dict[str, threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def get_test_index(github_token: str, repo_name: str, base_sha: str) -> RepoTestIndex:
+    """Test index of `repo_name` at `base_sha`, cached per SHA
+
+    A base SHA already seen is served from memory. Otherwise the repo's most
+    recent index is moved forward with one compare call when the new base is
+    ahead of it, and the tree is fetched with one recursive git-tree call
+    only when that is not possible.
+    """
+    with _lock:
+        index = _indexes.get((repo_name, base_sha))
+        if index is not None:
+            _indexes.move_to_end((repo_name, base_sha))
+            return index
+        repo_lock = _repo_locks.setdefault(repo_name, threading.Lock())
+
+    # One build per repo at a time, so concurrent reviews of the same base share it
+    with repo_lock:
+        with _lock:
+            index = _indexes.get((repo_name, base_sha))
+            previous = _latest.get(repo_name)
+        if index is not None:
+            return index
+
+        client = get_github_client(github_token)
+        changes = None
+        if previous is not None and not previous.truncated:
+            try:
+                changes = client.compare_paths(repo_name, previous.sha, base_sha)
+            except Exception:
+                changes = None
+        if changes is not None:
+            index = previous.updated(base_sha, changes)
+        else:
+            paths, truncated = client.get_tree_paths(repo_name, base_sha)
+            index = RepoTestIndex(repo_name, base_sha, paths, truncated)
+
+        with _lock:
+            _indexes[(repo_name, base_sha)] = index
+            _latest[repo_name] = index
+            _latest.move_to_end(repo_name)
+            while len(_indexes) > TEST_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+            while len(_latest) > TEST_INDEX_CACHE_SIZE:
+                evicted, _ = _latest.popitem(last=False)
+                evicted_lock = _repo_locks.get(evicted)
+                if evicted_lock is not None and not evicted_lock.locked():
+                    del _repo_locks[evicted]
+        return index
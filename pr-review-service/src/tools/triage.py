@@ -0,0 +1,90 @@
+import fnmatch
+import os
+from typing import Any, Dict, List, Optional
+from config.settings import SKIP_PATTERNS, SUMMARIZE_ONLY_PATTERNS, TRIAGE_BINARY_EXTENSIONS, TRIAGE_STATIC_EXTENSIONS
+from src.tools.batching import count_tokens
+from src.tools.diff_parser import iter_hunks
+
+
+SKIP = "skip"
+STATIC = "static"
+LLM = "llm"
+
+# Rough prompt framing (system prompt + instructions) a single-file model call adds to its patch
+PROMPT_OVERHEAD_TOKENS = 200
+
+
+def _matches(filename: str, patterns: List[str]) -> Optional[str]:
+    basename = filename.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(basename, pattern):
+            return pattern
+    return None
+
+
+def _is_whitespace_only(patch: str) -> bool:
+    """True when every hunk's old and new sides read the same, in order, once whitespace is ignored
+
+    Context lines are part of each side, so lines that swap places or move
+    past unchanged code count as a real change; lines that become blank are ignored.
+    """
+    changed = False
+    for hunk in iter_hunks(patch):
+        old: List[str] = []
+        new: List[str] = []
+        for line in hunk.lines:
+            text = "".join(line.text.split())
+            changed = changed or line.kind in ("-", "+")
+            if text and line.kind in (" ", "-"):
+                old.append(text)
+            if text and line.kind in (" ", "+"):
+                new.append(text)
+        if old != new:
+            return False
+    return changed
+
+
+def _has_added_lines(patch: str) -> bool:
+    return any(line.kind == "+" for hunk in iter_hunks(patch) for line in hunk.lines)
+
+
+def _decision(decision: str, reason: str, patch: str) -> Dict[str, Any]:
+    # Tokens a model call would have spent on this file; only counted for files that never reach the model
+    saved = count_tokens(patch) + PROMPT_OVERHEAD_TOKENS if patch and decision != LLM else 0
+    return {"decision": decision, "reason": reason, "estimated_tokens_saved": saved}
+
+
+def triage_file(file_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Decide, locally and cheaply, how much review a changed file needs.
+
+    Returns SKIP (nothing to review), STATIC (security scan and local summary
+    only) or LLM (full model review), with the reason for the decision.
+    """
+    filename = file_data["filename"]
+    status = file_data.get("status", "modified")
+    patch = file_data.get("patch") or ""
+    extension = os.path.splitext(filename)[1].lower()
+
+    pattern = _matches(filename, SKIP_PATTERNS)
+    if pattern:
+        return _decision(SKIP, f"matches ignore pattern `{pattern}`", patch)
+    if status == "removed":
+        return _decision(SKIP, "file deleted", patch)
+    if extension in TRIAGE_BINARY_EXTENSIONS:
+        return _decision(SKIP, f"binary asset ({extension})", patch)
+    if not patch:
+        if status == "renamed":
+            return _decision(SKIP, "pure rename", patch)
+        return _decision(SKIP, "no textual diff", patch)
+
+    pattern = _matches(filename, SUMMARIZE_ONLY_PATTERNS)
+    if pattern:
+        return _decision(STATIC, f"generated or vendored file (`{pattern}`)", patch)
+    if not _has_added_lines(patch):
+        return _decision(STATIC, "only removes lines", patch)
+    if _is_whitespace_only(patch):
+        return _decision(STATIC, "whitespace-only change", patch)
+    if extension in TRIAGE_STATIC_EXTENSIONS:
+        return _decision(STATIC, f"non-code file ({extension})", patch)
+
+    return _decision(LLM, "code change", patch)
@@ -0,0 +1,128 @@
+"""
+GitHub webhook handling: signature checks and per-PR debouncing.
+
+Bursts of `pull_request` events for one PR (several quick pushes, CI
+re-triggers) are coalesced into a single review of the newest head SHA, and
+a webhook review already running for an older SHA is cancelled.
+"""
+
+import hashlib
+import hmac
+import threading
+from typing import Dict, Optional, Tuple
+from src.core.job_queue import ReviewJob, ReviewJobQueue, QueueFullError
+from config.settings import WEBHOOK_DEBOUNCE_SECONDS
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Check an `X-Hub-Signature-256` header against the raw request body"""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+class WebhookDebouncer:
+    """Turns a stream of PR push events into one review per PR of its latest commit.
+
+    Each event (re)starts the PR's debounce timer; when the timer fires the
+    newest head SHA is queued, pinned to that commit. A pinned review still
+    queued or running for an older SHA is cancelled as soon as a newer SHA is
+    seen. Reviews requested through the API have no pinned commit: a webhook
+    may share one, but never adopts or cancels it.
+    """
+
+    def __init__(self, job_queue: ReviewJobQueue, window: float = WEBHOOK_DEBOUNCE_SECONDS,
+                 post_comment: bool = True):
+        self.job_queue = job_queue
+        self.window = max(0.0, window)
+        self.post_comment = post_comment
+        self._pending: Dict[Tuple[str, int], Tuple[str, threading.Timer]] = {}
+        self._active: Dict[Tuple[str, int], ReviewJob] = {}
+        # Re-entrant: cancelling a queued job calls `_done` on this thread
+        self._lock = threading.RLock()
+        self.coalesced = 0
+        self.superseded = 0
+
+    def push(self, repo_name: str, pr_number: int, head_sha: str) -> str:
+        """Record a new head SHA for a PR; returns "scheduled", "coalesced" or "duplicate" """
+        key = (repo_name, pr_number)
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and key not in self._pending and active.head_sha == head_sha:
+                # Redelivery of the commit already under review
+                return "duplicate"
+
+            if active is not None and active.head_sha != head_sha:
+                if self.job_queue.cancel(active.job_id):
+                    self.superseded += 1
+                self._active.pop(key, None)
+
+            outcome = "scheduled"
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending[1].cancel()
+                self.coalesced += 1
+                outcome = "coalesced"
+
+            self._schedule(key, head_sha, self.window)
+            return outcome
+
+    def drop(self, repo_name: str, pr_number: int) -> bool:
+        """Forget a PR (e.g. closed): cancel its pending timer and any unfinished review"""
+        key = (repo_name, pr_number)
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is not None:
+                pending[1].cancel()
+            active = self._active.pop(key, None)
+            cancelled = active is not None and self.job_queue.cancel(active.job_id)
+            return pending is not None or cancelled
+
+    def stop(self):
+        """Cancel every pending timer (reviews already queued are left to the job queue)"""
+        with self._lock:
+            for _, timer in self._pending.values():
+                timer.cancel()
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "active": len(self._active),
+                "coalesced": self.coalesced,
+                "superseded": self.superseded,
+            }
+
+    def _schedule(self, key: Tuple[str, int], head_sha: str, delay: float):
+        """Arm the PR's timer; caller holds the lock"""
+        timer = threading.Timer(delay, self._fire, args=(key, head_sha))
+        timer.daemon = True
+        self._pending[key] = (head_sha, timer)
+        timer.start()
+
+    def _fire(self, key: Tuple[str, int], head_sha: str):
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending[1] is not threading.current_thread():
+                return  # Replaced by a newer event after this timer fired
+            del self._pending[key]
+            try:
+                job = self.job_queue.submit(
+                    key[0], key[1], post_comment=self.post_comment, head_sha=head_sha, on_done=self._done,
+                    supersede=True
+                )
+            except QueueFullError:
+                # Try again after another window rather than dropping the latest commit
+                self._schedule(key, head_sha, max(self.window, 1.0))
+                return
+            # Only a review pinned to this commit is ours; one an API request started is theirs to keep
+            if job.head_pinned and job.head_sha == head_sha:
+                self._active[key] = job
+
+    def _done(self, job: ReviewJob):
+        with self._lock:
+            key = (job.repo_name, job.pr_number)
+            if self._active.get(key) is job:
+                del self._active[key]
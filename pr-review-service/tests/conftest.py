@@ -0,0 +1,6 @@
+import os
+from benchmarks.run import BENCH_ENVIRONMENT
+
+# The benchmarks' isolated settings: no telemetry, and no caches, state or history shared between tests
+for name, value in BENCH_ENVIRONMENT.items():
+    os.environ.setdefault(name, value)
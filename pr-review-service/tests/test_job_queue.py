@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from src.core.job_queue import COMPLETED, QUEUED, RUNNING, ReviewJobQueue
+from src.core.shared_queue import SQLiteReviewJobQueue
+
+
+HEAD = "a" * 40
+
+
+class BlockingHandler:
+    """Reviews that report `HEAD` as the fetched head, then wait until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.fetched = threading.Event()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, job):
+        with self.lock:
+            self.calls += 1
+        job.emit("pr_info", {"pr_info": {"head_sha": HEAD}})
+        self.fetched.set()
+        self.release.wait(10)
+        return {"head_sha": HEAD}
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def memory_queues(tmp_path, handler):
+    queue = ReviewJobQueue(handler, workers=4, max_per_repo=4)
+    return queue, queue
+
+
+def sqlite_queues(tmp_path, handler):
+    path = str(tmp_path / "jobs.sqlite3")
+    options = dict(workers=4, max_per_repo=4, path=path, poll_interval=0.05)
+    return SQLiteReviewJobQueue(handler, **options), SQLiteReviewJobQueue(handler, **options)
+
+
+@pytest.mark.parametrize("make_queues", [memory_queues, sqlite_queues])
+def test_second_request_while_running_does_not_start_another_review(tmp_path, make_queues):
+    handler = BlockingHandler()
+    first_queue, second_queue = make_queues(tmp_path, handler)
+    for queue in {first_queue, second_queue}:
+        queue.start()
+    try:
+        first = first_queue.submit("o/r", 1)
+        assert handler.fetched.wait(10)
+        wait_for(lambda: first_queue.get(first.job_id).head_sha == HEAD)
+
+        # The running review has recorded the head it fetched
+        assert second_queue.get(first.job_id).status == RUNNING
+        assert second_queue.get(first.job_id).head_sha == HEAD
+        assert second_queue.submit("o/r", 1, head_sha=HEAD).job_id == first.job_id
+
+        # Without a commit, the request waits instead of running beside it, and later ones share it
+        second = second_queue.submit("o/r", 1)
+        assert second_queue.submit("o/r", 1).job_id == second.job_id
+        time.sleep(0.3)
+        assert second_queue.get(second.job_id).status == QUEUED
+        assert first_queue.metrics()["running_per_repo"] == {"o/r": 1}
+        assert handler.calls == 1
+
+        handler.release.set()
+        wait_for(lambda: second_queue.get(second.job_id).status == COMPLETED)
+        assert handler.calls == 2
+    finally:
+        handler.release.set()
+        for queue in {first_queue, second_queue}:
+            queue.stop(10)
@@ -0,0 +1,53 @@
+import pytest
+from src.tools.security_scanner import DEFAULT_SCANNER, is_serious
+from src.agents.pr_reviewer_agent import PRReviewerAgent
+
+
+ORDINARY_LINES = [
+    "const node = React.createElement(Dropdown, { value: selected });",
+    "import Dropdown from './components/Dropdown';",
+    "item.updatedAt = new Date();",
+    "select_all_rows(rows)",
+    "deleted_from_cache = True",
+]
+
+
+def recommendation(security_issues):
+    agent = PRReviewerAgent.__new__(PRReviewerAgent)
+    return agent._get_recommendation([], security_issues, {"coverage_assessment": "adequate"})
+
+
+@pytest.mark.parametrize("line", ORDINARY_LINES)
+def test_identifiers_containing_sql_keywords_are_not_sql_injection(line):
+    assert [issue for issue in DEFAULT_SCANNER.scan_text(line) if issue["type"] == "sql_injection"] == []
+
+
+def test_ordinary_frontend_change_is_not_blocked():
+    issues = DEFAULT_SCANNER.scan_text("\n".join(ORDINARY_LINES))
+    assert not any(is_serious(issue) for issue in issues)
+    assert not recommendation(issues).startswith("CHANGES_REQUESTED")
+
+
+@pytest.mark.parametrize("line", [
+    'cursor.execute(f"SELECT * FROM users WHERE id = {user_id}")',
+    'query = "SELECT name FROM users WHERE id = " + user_id',
+    'db.query(`DELETE FROM sessions WHERE id = ${sessionId}`)',
+    'cursor.execute("UPDATE users SET name = \'%s\'" % name)',
+    'sql = "INSERT INTO logs VALUES ({})".format(message)',
+])
+def test_interpolated_sql_is_reported(line):
+    assert [issue["type"] for issue in DEFAULT_SCANNER.scan_text(line)] == ["sql_injection"]
+
+
+@pytest.mark.parametrize("line", [
+    'cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))',
+    'cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))',
+])
+def test_parameterized_sql_is_not_reported(line):
+    assert DEFAULT_SCANNER.scan_text(line) == []
+
+
+def test_only_confident_high_severity_findings_request_changes():
+    issues = DEFAULT_SCANNER.scan_text('query = "SELECT name FROM users WHERE id = " + user_id')
+    assert not recommendation(issues).startswith("CHANGES_REQUESTED")
+    assert recommendation(DEFAULT_SCANNER.scan_text("eval(payload)")).startswith("CHANGES_REQUESTED")
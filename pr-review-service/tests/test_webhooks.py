@@ -0,0 +1,66 @@
+import time
+from benchmarks.fakes import FakeGithub, FakeOpenAI, PRShape
+from config.settings import GITHUB_TOKEN
+from src.core.job_queue import QUEUED, ReviewJobQueue
+from src.main import review_pull_request
+from src.tools.analysis_tools import set_openai_client
+from src.tools.github_client import GitHubClient, register_github_client
+from src.webhooks import WebhookDebouncer
+
+
+def settle(debouncer):
+    deadline = time.monotonic() + 5
+    while debouncer.stats()["pending"]:
+        assert time.monotonic() < deadline, "debounce timer never fired"
+        time.sleep(0.01)
+
+
+def test_webhook_never_cancels_a_review_requested_through_the_api():
+    # Not started, so every job stays queued
+    job_queue = ReviewJobQueue(lambda job: {})
+    debouncer = WebhookDebouncer(job_queue, window=0)
+    manual = job_queue.submit("o/r", 1)
+
+    debouncer.push("o/r", 1, "a" * 40)
+    settle(debouncer)
+    assert debouncer.stats()["active"] == 0
+
+    debouncer.push("o/r", 1, "b" * 40)
+    settle(debouncer)
+    assert job_queue.get(manual.job_id).status == QUEUED
+    assert not manual.cancel_event.is_set()
+
+
+def test_webhook_cancels_its_own_review_of_an_older_commit():
+    job_queue = ReviewJobQueue(lambda job: {})
+    debouncer = WebhookDebouncer(job_queue, window=0)
+
+    debouncer.push("o/r", 1, "a" * 40)
+    settle(debouncer)
+    first = job_queue.submit("o/r", 1, head_sha="a" * 40)
+    assert first.head_pinned
+
+    debouncer.push("o/r", 1, "b" * 40)
+    settle(debouncer)
+    assert first.cancel_event.is_set()
+    assert debouncer.stats()["superseded"] == 1
+
+
+def review(head_sha):
+    github = FakeGithub(PRShape(files=3, test_files=1), latency=0, jitter=0)
+    register_github_client(GITHUB_TOKEN, GitHubClient(GITHUB_TOKEN, github=github))
+    set_openai_client(FakeOpenAI(latency=0, jitter=0))
+    return github, review_pull_request("o/r", 1, post_comment=True, head_sha=head_sha)
+
+
+def test_comment_is_skipped_when_the_head_moved_past_the_pinned_commit():
+    github, result = review("f" * 40)
+    assert "comment_skipped" in result
+    assert "comment_posted" not in result
+    assert github._comments.get(1, []) == []
+
+
+def test_comment_is_posted_for_the_pinned_commit():
+    github, result = review(f"{1:040x}")
+    assert "comment_skipped" not in result
+    assert len(github._comments[1]) == 1